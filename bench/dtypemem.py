@@ -0,0 +1,80 @@
+#==================================================================================================
+# dtypemem.py - memory benchmark of reading a simulation as float64 and as float32
+#
+# Each dtype is measured in a fresh interpreter, first parsing the text files (which
+# also writes the binary cache entries for that dtype) and then reading the cache.
+#
+# Usage:  python bench/dtypemem.py [-d DIRNAME ...] simname
+#
+#    run from the directory holding the simulation
+#
+import os
+import sys
+import argparse
+import subprocess
+
+loadcode = """
+import os, sys, time, resource
+from libaccess import pltutils
+pltutils.setdtype({dtype!r})
+names = []
+for dirname in {dirnames!r}:
+    ddir = {simname!r}+"/"+dirname
+    for fname in sorted(os.listdir(ddir)):
+        if (fname.endswith(".dat")):
+            with open(ddir+"/"+fname) as fh:
+                if (len(fh.readline().split()) > 2):       # height-time files only
+                    names.append((dirname, fname[:-4]))
+rss0 = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+t0 = time.time()
+pvars = pltutils.getvars({simname!r}, names)
+dt = time.time()-t0
+nbytes = sum(var.nbytes for z, var in pvars.values())
+rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss-rss0
+print(len(names), nbytes, rss*1024, dt)
+"""
+
+def measure(pkgroot, simname, dirnames, dtype):
+    """Reads the height-time files of a simulation in a fresh interpreter
+
+    Args:
+       pkgroot  (str)       : directory holding the libaccess package
+       simname  (str)       : ACCESS simulation name
+       dirnames (list(str)) : simulation output directories to read
+       dtype    (str)       : numpy float dtype to read into
+
+    Returns:
+       nfiles (int)         : number of files read
+       nbytes (int)         : size of the arrays read (bytes)
+       rss    (int)         : growth of the peak resident memory (bytes)
+       dt     (float)       : read time (s)
+    """
+    code = loadcode.format(dtype=dtype, dirnames=dirnames, simname=simname)
+    out  = subprocess.run([sys.executable, "-c", code], capture_output=True, text=True, check=True,
+                          env=dict(os.environ, PYTHONPATH=pkgroot)).stdout.split()
+
+    return int(out[0]), int(out[1]), int(out[2]), float(out[3])
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Compare memory use of float64 and float32 reads")
+    parser.add_argument("simname", help="ACCESS simulation name")
+    parser.add_argument("-d", "--dirname", action="append", dest="dirnames",
+                        help="output directory to read (repeatable), default is all")
+    args = parser.parse_args(argv)
+
+    pkgroot  = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    dirnames = args.dirnames
+    if (dirnames is None):
+        dirnames = [d for d in sorted(os.listdir(args.simname))
+                    if os.path.isdir(args.simname+"/"+d) and not d.startswith(".")]
+
+    for dtype in ["float64", "float32"]:
+        for source in ["text", "cache"]:
+            nfiles, nbytes, rss, dt = measure(pkgroot, args.simname, dirnames, dtype)
+            print("%-7s %-5s %d files: arrays %.0f MB, peak RSS +%.0f MB, %.2f s" %
+                  (dtype, source, nfiles, nbytes/2**20, rss/2**20, dt))
+
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,88 @@
+#==================================================================================================
+# startup.py - import time and cold start benchmark of the libaccess plotting modules
+#
+# Every measurement runs in a fresh interpreter, so nothing is already imported.
+#
+# Usage:  python bench/startup.py [-n NRUNS] [simname]
+#
+#    run from the directory holding the simulation; with a simname, also times a
+#    cold headless metvar.plotprofs png render, including interpreter start
+#
+import os
+import sys
+import time
+import argparse
+import subprocess
+
+# plotting modules imported by the benchmark
+modules = ["budget", "canopy", "genspc", "genvar", "metvar", "pall1t", "rxns", "tseries", "batch"]
+
+# heavy modules that should not be loaded by importing libaccess
+heavy = ["matplotlib.pyplot", "seaborn", "pandas"]
+
+importcode = """
+import sys, time
+t0 = time.time()
+import {imports}
+dt = time.time()-t0
+print(dt, ",".join(m for m in {heavy!r} if m in sys.modules))
+"""
+
+rendercode = """
+from libaccess import metvar
+metvar.plotprofs({simname!r}, "tk", "png", 4, -1., 10.)
+"""
+
+def timeimport(pkgroot):
+    """Imports the plotting modules in a fresh interpreter
+
+    Args:
+       pkgroot (str)  : directory holding the libaccess package
+
+    Returns:
+       dt (float)     : import time (s)
+       loaded (str)   : heavy modules loaded by the import
+    """
+    code = importcode.format(imports=", ".join("libaccess."+mod for mod in modules), heavy=heavy)
+    out  = subprocess.run([sys.executable, "-c", code], capture_output=True, text=True, check=True,
+                          env=dict(os.environ, PYTHONPATH=pkgroot)).stdout.split()
+
+    return float(out[0]), (out[1] if (len(out) > 1) else "")
+
+def timerender(pkgroot, simname):
+    """Renders one figure in a fresh interpreter, timing it from the start of the interpreter
+
+    Args:
+       pkgroot (str)  : directory holding the libaccess package
+       simname (str)  : ACCESS simulation name
+
+    Returns:
+       dt (float)     : wall time (s)
+    """
+    t0 = time.time()
+    subprocess.run([sys.executable, "-c", rendercode.format(simname=simname)], check=True,
+                   env=dict(os.environ, PYTHONPATH=pkgroot))
+
+    return time.time()-t0
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Time importing libaccess and a cold render")
+    parser.add_argument("simname", nargs="?", help="ACCESS simulation name for the cold render (optional)")
+    parser.add_argument("-n", "--nruns", type=int, default=3, help="number of runs of each measurement")
+    args = parser.parse_args(argv)
+
+    pkgroot = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+    for i in range(args.nruns):
+        dt, loaded = timeimport(pkgroot)
+        print("import of %d modules: %.3f s, heavy modules loaded: %s" % (len(modules), dt, loaded or "none"))
+
+    if (args.simname is not None):
+        os.makedirs("img", exist_ok=True)
+        for i in range(args.nruns):
+            print("cold metvar.plotprofs png render: %.2f s" % timerender(pkgroot, args.simname))
+
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
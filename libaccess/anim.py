@@ -0,0 +1,203 @@
+#==========================================================================================================
+# anim.py - animates the evolution of vertical profiles over a simulation
+#
+# Frames are drawn by updating the line data of one figure, and each frame is
+# passed to the movie encoder (or written as its own image) as soon as it is
+# drawn, so memory stays bounded however many output times are animated.
+#
+import os
+import numpy as np
+from datetime import datetime
+from .backend import newfig
+from .pltutils import timekeys, getvars
+from .panels import fmtpanel, seldata
+from .pall1t import getall1ts, newall1t, drawall1t
+
+# set colors
+colors = ["gray", "peru", "brown", "red", "royalblue", "green", "violet", "magenta", "cyan", "olive"]
+
+# set common figure formatting parameters
+tfsize   = 18     # plot title font size
+lnwdth   = 2.0    # linewidth
+
+# movie writers tried in order for each movie type
+moviewriters = {"mp4": ["ffmpeg"], "gif": ["imagemagick", "ffmpeg", "pillow"]}
+
+def getwriter(outtype, fps):
+    """Returns a movie writer for the movie type
+
+    Writers that pipe frames to an external encoder are preferred.  The pillow
+    writer, used for gifs if no encoder is installed, keeps every frame in
+    memory until the end.
+
+    Args:
+       outtype (str)   : either 'mp4' or 'gif'
+       fps     (int)   : frames per second
+
+    Returns:
+       writer (obj)    : matplotlib MovieWriter, or None if none is available
+    """
+    from matplotlib import animation
+
+    for name in moviewriters[outtype]:
+        if animation.writers.is_available(name):
+            return animation.writers[name](fps=fps)
+
+    return None
+
+def writeframes(simname, fig, outtype, outfn, nframes, drawframe, fps, dpi):
+    """Draws the frames of an animation and streams them to the output
+
+    Args:
+       simname   (str)   : ACCESS simulation name
+       fig       (obj)   : matplotlib Figure the frames are drawn on
+       outtype   (str)   : 'mp4' or 'gif' for a movie, 'png' or 'pdf' for a numbered image per frame
+       outfn     (str)   : string for output file name
+       nframes   (int)   : number of frames
+       drawframe (func)  : function drawing frame k on fig
+       fps       (int)   : frames per second of a movie
+       dpi       (float) : resolution of the frames, default is the figure's
+
+    Returns:
+       status (int)      : 0, or 1 if the output type cannot be written
+    """
+    # output file name
+    ofname = os.getcwd()+"/img/"+simname+"_"+outfn
+
+    if (outtype == "png" or outtype == "pdf"):
+        for k in range(nframes):
+            drawframe(k)
+            fig.savefig(ofname+"_"+str(k).zfill(5)+"."+outtype, dpi=dpi)
+        return 0
+
+    if (outtype not in moviewriters):
+        print("Unknown animation output type!")
+        return 1
+
+    writer = getwriter(outtype, fps)
+    if (writer is None):
+        print("No movie writer available for "+outtype+" (install ffmpeg)!")
+        return 1
+
+    with writer.saving(fig, ofname+"."+outtype, dpi if dpi is not None else fig.dpi):
+        for k in range(nframes):
+            drawframe(k)
+            writer.grab_frame()
+
+    return 0
+
+###########################################################################################################
+# animprofs - animate vertical profiles of defined variables over a simulation
+#
+def animprofs(simname, specs, outtype, outfn, tstep=1, fps=10, layout=None, figsize=None, suptitle=None,
+              dpi=None, tstart=None, tend=None):
+    """Animate the vertical profiles of defined variables, one panel for each
+       variable spec, with one frame for every tstep output times
+
+    The x-axis of each panel spans the whole range of its variable over the
+    animation (unless xmax is given), so frames only update the line data and
+    the title.
+
+    Args:
+       simname  (str)        : ACCESS simulation name
+       specs    (list(dict)) : variable specs, one per panel (see panels.plotpanels)
+       outtype  (str)        : 'mp4' or 'gif' for a movie, 'png' or 'pdf' for a numbered image per frame
+       outfn    (str)        : string for output file name
+       tstep    (int)        : time step interval between frames
+       fps      (int)        : frames per second of a movie
+       layout   (tuple)      : (nrows, ncols) of panels, default is one row
+       figsize  (tuple)      : figure (width, height) in inches, default is 4+4*ncols by 10*nrows
+       suptitle (str)        : figure title, followed by the time of each frame (optional)
+       dpi      (float)      : resolution of the frames, default is the figure's
+       tstart   (datetime)   : start of a time window to animate, or "YYYY-MM-DD HH:MM:SS" (optional)
+       tend     (datetime)   : end of a time window to animate (optional)
+
+    Returns:
+       status (int)          : 0, or 1 if the output type cannot be written
+    """
+    # read elapsed hour/datetime key file
+    dts, hrs = timekeys(simname, tstart, tend)
+    fdts = dts[::tstep]
+
+    # get data for all distinct vars at once
+    names = []
+    for spec in specs:
+        if ("data" not in spec and (spec["dirname"], spec["varname"]) not in names):
+            names.append((spec["dirname"], spec["varname"]))
+    pvars = getvars(simname, names, slice(0, None, tstep), tstart, tend)
+
+    # create the figure with the first frame
+    if (layout is None):
+        layout = (1, len(specs))
+    nrows, ncols = layout
+    if (figsize is None):
+        figsize = (4+4*ncols, 10*nrows)
+    fig = newfig("png", figsize)
+
+    lines = []
+    pdata = []
+    for i, spec in enumerate(specs):
+        if ("data" in spec):
+            z, var = seldata(simname, spec, slice(0, None, tstep), tstart, tend)
+        else:
+            z, var = pvars[spec["dirname"], spec["varname"]]
+        pdata.append(var)
+
+        ax = fig.add_subplot(nrows, ncols, i+1)
+        line, = ax.plot(var[:, 0], z, color=colors[4], linestyle="-", linewidth=lnwdth)
+        lines.append(line)
+
+        # fix the x-axis to the range over all frames
+        vmin = np.nanmin(var)
+        vmax = np.nanmax(var)
+        dv = 0.05*(vmax-vmin) if (vmax > vmin) else 0.5
+        ax.set_xlim(vmin-dv, vmax+dv)
+
+        # set limits, labels (height only on the first column), title and formatting
+        fmtpanel(ax, spec, z, i % ncols == 0)
+
+    title = fig.suptitle("", fontsize=tfsize, x=0.5, y=0.97)
+
+    def drawframe(k):
+        for line, var in zip(lines, pdata):
+            line.set_xdata(var[:, k])
+        tstr = datetime.strftime(fdts[k], "%Y-%m-%d %H:%M")
+        title.set_text(tstr if (suptitle is None) else suptitle+" - "+tstr)
+
+    return writeframes(simname, fig, outtype, outfn, len(fdts), drawframe, fps, dpi)
+
+###########################################################################################################
+# animall1t - animate the pall1t canopy profiles over a simulation
+#
+def animall1t(simname, outtype, outfn="pall1t", tslices=None, fps=5, dpi=None):
+    """Animate the figure of all canopy profiles of pall1t.pltall1t, with
+       one frame for each time slice
+
+    Args:
+       simname  (str)       : ACCESS simulation name
+       outtype  (str)       : 'mp4' or 'gif' for a movie, 'png' or 'pdf' for a numbered image per frame
+       outfn    (str)       : string for output file name
+       tslices  (list(int)) : time slices from the simulation (t0 = 1), default is all
+       fps      (int)       : frames per second of a movie
+       dpi      (float)     : resolution of the frames, default is the figure's
+
+    Returns:
+       status (int)         : 0, or 1 if the output type cannot be written
+    """
+    # read elapsed hour/datetime key file
+    dts, hrs = timekeys(simname)
+    if (tslices is None):
+        tslices = range(1, len(dts))
+
+    tslices = list(tslices)
+
+    # read the profiles of all frames at once, each file is parsed only once
+    profs = getall1ts(simname, tslices)
+
+    tmpl = newall1t("png")
+
+    def drawframe(k):
+        tslice = tslices[k]
+        drawall1t(tmpl, profs[k], simname+" - "+datetime.strftime(dts[tslice], "%Y-%m-%d %H:%M:%S"))
+
+    return writeframes(simname, tmpl["fig"], outtype, outfn, len(tslices), drawframe, fps, dpi)
@@ -0,0 +1,80 @@
+#==================================================================================================
+# backend.py - selects the matplotlib backend for the requested output type
+#
+# pyplot is only imported when a figure is actually drawn, with a non-interactive
+# backend for file output and an interactive one only for 'x11' output, so that
+# importing libaccess is fast and works on headless batch nodes.
+#
+import os
+import sys
+
+# interactive backends tried in order for 'x11' output (LIBACCESS_BACKEND overrides)
+interactive = ["WXAgg", "QtAgg", "TkAgg", "MacOSX"]
+
+# file-only backends
+noninteractive = ["agg", "cairo", "pdf", "pgf", "ps", "svg", "template"]
+
+def getplt(outtype):
+    """Selects a matplotlib backend suited to the output type and returns pyplot
+
+    For file output ('pdf' or 'png') the Agg backend is used unless pyplot is
+    already running with another backend (Agg writes pdf files through
+    savefig as well).  For 'x11' output the first interactive backend that can
+    be loaded is used.
+
+    Args:
+       outtype (str)  : either 'pdf', 'png', or 'x11'
+
+    Returns:
+       plt (module)   : matplotlib.pyplot
+    """
+    import matplotlib
+
+    if (outtype == "pdf" or outtype == "png"):
+        if ("matplotlib.pyplot" not in sys.modules):
+            matplotlib.use("Agg")
+        import matplotlib.pyplot as plt
+        return plt
+
+    import matplotlib.pyplot as plt
+    if (plt.get_backend().lower() not in noninteractive):
+        return plt
+
+    candidates = interactive
+    if ("LIBACCESS_BACKEND" in os.environ):
+        candidates = [os.environ["LIBACCESS_BACKEND"]]+interactive
+    for name in candidates:
+        try:
+            plt.switch_backend(name)
+            break
+        except (ImportError, RuntimeError):
+            pass
+
+    return plt
+
+def newfig(outtype, figsize):
+    """Creates a new figure for the output type
+
+    Figures for file output are plain matplotlib Figure objects with their own
+    Agg canvas, outside pyplot's global figure manager, so they can be drawn
+    concurrently from several threads and are freed as soon as they are no
+    longer referenced.  Figures for 'x11' output are created through pyplot so
+    that they can be shown.
+
+    Args:
+       outtype (str)     : either 'pdf', 'png', or 'x11'
+       figsize (tuple)   : figure (width, height) in inches
+
+    Returns:
+       fig (obj)         : matplotlib Figure
+    """
+    if (outtype == "pdf" or outtype == "png"):
+        from matplotlib.figure import Figure
+        from matplotlib.backends.backend_agg import FigureCanvasAgg
+        fig = Figure(figsize=figsize)
+        FigureCanvasAgg(fig)
+        return fig
+
+    plt = getplt(outtype)
+
+    return plt.figure(figsize=figsize)
@@ -0,0 +1,210 @@
+#==================================================================================================
+# batch.py - renders many figures in parallel with a pool of worker processes
+#
+# Each job is one call of a libaccess plotting function, e.g.
+#
+#    {"func": "rxns.plotprofs", "args": ["sim1", "rates", 42, "png", 4, -1.0, -1.0, 20.0],
+#     "kwargs": {"outfn": "rates_rxn00042"}}
+#
+# and draws one independent figure in its worker, written to img/ by pltoutput.
+#
+# Usage:  python -m libaccess.batch [-n NWORKERS] jobs.json
+#
+import os
+import sys
+import json
+import time
+import argparse
+import importlib
+import traceback
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from .rxns import getrxnnums, rxnname
+
+# modules providing plotting functions for jobs
+plotmodules = ["anim", "budget", "canopy", "genspc", "genvar", "metvar", "pall1t", "panels", "rxns", "tseries"]
+
+def initworker():
+    """Prepares a worker process for rendering figures to files
+
+    Imports the plotting modules, then selects the non-interactive Agg backend
+    so no display is needed on batch nodes.
+
+    Args:
+       None
+
+    Returns:
+       Nothing
+    """
+    for modname in plotmodules:
+        importlib.import_module("libaccess."+modname)
+
+    import matplotlib.pyplot as plt
+    plt.switch_backend("Agg")
+
+    return
+
+def jobname(job):
+    """Returns a short description of a job for reports
+
+    Args:
+       job (dict)   : job with "func", "args", and optional "kwargs" and "name"
+
+    Returns:
+       name (str)   : the job's name, or its function and arguments
+    """
+    if ("name" in job):
+        return job["name"]
+
+    return job["func"]+"("+", ".join(str(arg) for arg in job.get("args", []))+")"
+
+def runjob(job):
+    """Runs one plotting job and times it
+
+    Any exception raised by the job is caught and reported in the result, so a
+    failing job never stops the rest of the batch.  A plotting function that
+    rejects its arguments returns the status 1, which also marks the job failed.
+
+    Args:
+       job (dict)      : job with "func", "args", and optional "kwargs" and "name"
+
+    Returns:
+       result (dict)   : job name, ok flag, run time (s) and error message
+    """
+    import matplotlib.pyplot as plt
+
+    t0 = time.time()
+    try:
+        modname, funcname = job["func"].rsplit(".", 1)
+        if (modname not in plotmodules):
+            raise ValueError("Unknown plotting module: "+modname)
+        func = getattr(importlib.import_module("libaccess."+modname), funcname)
+        status = func(*job.get("args", []), **job.get("kwargs", {}))
+        if (type(status) is int and status != 0):
+            error = job["func"]+" returned status "+str(status)
+        else:
+            error = None
+    except Exception:
+        error = traceback.format_exc()
+    finally:
+        plt.close("all")
+
+    return {"name": jobname(job), "ok": error is None, "time": time.time()-t0, "error": error}
+
+def renderbatch(jobs, nworkers=None, verbose=True):
+    """Renders a list of plotting jobs with a pool of worker processes
+
+    Args:
+       jobs     (list(dict)) : jobs with "func", "args", and optional "kwargs" and "name"
+       nworkers (int)        : number of worker processes, default is the number of CPUs
+       verbose  (bool)       : print a line for each finished job and a summary
+
+    Returns:
+       results (list(dict))  : result of each job, in the order of jobs
+    """
+    os.makedirs(os.getcwd()+"/img", exist_ok=True)
+
+    t0 = time.time()
+    results = [None]*len(jobs)
+    with ProcessPoolExecutor(nworkers, initializer=initworker) as executor:
+        futures = {executor.submit(runjob, job): i for i, job in enumerate(jobs)}
+        for future in as_completed(futures):
+            i = futures[future]
+            try:
+                results[i] = future.result()
+            except Exception:
+                # the worker itself died (e.g., killed for memory)
+                results[i] = {"name": jobname(jobs[i]), "ok": False, "time": 0.0, "error": traceback.format_exc()}
+            if verbose:
+                result = results[i]
+                status = "ok    " if result["ok"] else "FAILED"
+                print("%s %7.2f s  %s" % (status, result["time"], result["name"]))
+                if (not result["ok"]):
+                    print(result["error"].rstrip().split("\n")[-1])
+
+    if verbose:
+        nfail = sum(1 for result in results if not result["ok"])
+        print("%d jobs, %d failed, %.1f s" % (len(jobs), nfail, time.time()-t0))
+
+    return results
+
+def rxnjobs(simname, dirname, rxnnums, outtype, intdt, zmax, xmax, hc):
+    """Creates rxns.plotprofs jobs for many reactions
+
+    Args:
+       simname  (str)       : ACCESS simulation name
+       dirname  (str)       : simulation output directory, either "rates" or "ks"
+       rxnnums  (list(int)) : reaction numbers, default is all in the output directory
+       outtype  (str)       : either 'pdf' or 'png'
+       intdt    (int)       : time step interval for plotting profiles
+       zmax     (float)     : height of the top of the plotted domain (m)
+       xmax     (float)     : maximum value on x-axis
+       hc       (float)     : canopy height (m)
+
+    Returns:
+       jobs (list(dict))    : one job per reaction, each with its own output file
+    """
+    if (rxnnums is None):
+        rxnnums = [int(rxnnum) for rxnnum in getrxnnums(simname, dirname)]
+
+    jobs = []
+    for rxnnum in rxnnums:
+        srxnnum = rxnname(rxnnum)
+        jobs.append({"func": "rxns.plotprofs", "name": dirname+"/"+srxnnum,
+                     "args": [simname, dirname, rxnnum, outtype, intdt, zmax, xmax, hc],
+                     "kwargs": {"outfn": dirname+"_"+srxnnum}})
+
+    return jobs
+
+def spcjobs(simname, dirname, spcnames, varunits, outtype, intdt, zmax, xmax, hc):
+    """Creates genspc.plotprofs jobs for many species
+
+    Args:
+       simname  (str)       : ACCESS simulation name
+       dirname  (str)       : simulation output directory
+       spcnames (list(str)) : species names, default is all in the output directory
+       varunits (str)       : units string for x-axis labels
+       outtype  (str)       : either 'pdf' or 'png'
+       intdt    (int)       : time step interval for plotting profiles
+       zmax     (float)     : height of the top of the plotted domain (m)
+       xmax     (float)     : maximum value on x-axis
+       hc       (float)     : canopy height (m)
+
+    Returns:
+       jobs (list(dict))    : one job per species, each with its own output file
+    """
+    if (spcnames is None):
+        fnames = sorted(os.listdir(os.getcwd()+"/"+simname+"/"+dirname))
+        spcnames = [fname[:-4] for fname in fnames if fname.endswith(".dat")]
+
+    jobs = []
+    for spcname in spcnames:
+        jobs.append({"func": "genspc.plotprofs", "name": dirname+"/"+spcname,
+                     "args": [simname, dirname, spcname, varunits, spcname, outtype, dirname+"_"+spcname,
+                              intdt, zmax, xmax, hc]})
+
+    return jobs
+
+def main(argv=None):
+    """Command line interface for rendering a job list
+
+    Args:
+       argv (list(str))  : command line arguments, default is sys.argv[1:]
+
+    Returns:
+       status (int)      : exit status, 1 if any job failed
+    """
+    parser = argparse.ArgumentParser(prog="python -m libaccess.batch",
+                                     description="Render libaccess figures in parallel from a JSON job list")
+    parser.add_argument("jobfile", help="JSON file with a list of jobs, each {\"func\", \"args\", \"kwargs\", \"name\"}")
+    parser.add_argument("-n", "--nworkers", type=int, default=None, help="number of worker processes (default: number of CPUs)")
+    args = parser.parse_args(argv)
+
+    with open(args.jobfile) as fh:
+        jobs = json.load(fh)
+
+    results = renderbatch(jobs, args.nworkers)
+
+    return 0 if all(result["ok"] for result in results) else 1
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -5,12 +5,10 @@
 # Rick D. Saylor, August 2018
 #
 import os
-from matplotlib import use
-use("WXAgg")
-import matplotlib.pylab as plt
 import numpy as np
-import seaborn as sns
-from .pltutils import pltoutput, timekeys, get1Dvar, setstdfmts
+from .backend import newfig
+from .pltutils import pltoutput, timekeys, timekeys64, timewindow, getvars, setstdfmts, trapezoid
+from .tseries import plottsdata
 
 # set colors
 colors = ["gray", "peru", "brown", "red", "royalblue", "green", "violet", "magenta", "cyan", "olive"]
@@ -29,6 +27,11 @@ tlbsize  = 17     # tick label font size
 tlbpad   =  3     # tick label padding
 lnwdth   = 1.5    # linewidth
 
+# budget terms, their labels and colors
+bterms   = ["bcn", "bch", "bdp", "bem", "bvt"]
+blabels  = ["cns", "chm", "dep", "ems", "vtx"]
+bcolors  = [colors[0], colors[3], colors[4], colors[5], colors[1]]
+
 ###########################################################################################################
 # plotprofs - create a one-panel figure for the budget rates of defined species variable
 #
@@ -48,69 +51,327 @@ def plotprofs(simname, spcname, varunits, outtype, outfn, itime, zmax, xmax, hc)
        hc       (flost) : canopy height (m)
 
     Returns:
-       Nothing
+       fig (obj)        : matplotlib Figure
     """
     # read elapsed hour/datetime key file
     dts, hrs = timekeys(simname)
 
-    # get budget data for the species
+    # get budget data for the species, all five terms at once
     dirname = "budget"
+    bvars = getvars(simname, [(dirname, spcname+"_"+term) for term in ["bcn", "bch", "bdp", "bem", "bvt"]], itime)
 
     # constrained
-    z, bad = get1Dvar(simname, dirname, spcname+"_bcn")
+    z, bad = bvars[dirname, spcname+"_bcn"]
 
     # chemistry
-    z, bch = get1Dvar(simname, dirname, spcname+"_bch")
+    z, bch = bvars[dirname, spcname+"_bch"]
 
     # deposition
-    z, bdp = get1Dvar(simname, dirname, spcname+"_bdp")
+    z, bdp = bvars[dirname, spcname+"_bdp"]
 
     # emission
-    z, bem = get1Dvar(simname, dirname, spcname+"_bem")
+    z, bem = bvars[dirname, spcname+"_bem"]
 
     # vertical transport
-    z, bvt = get1Dvar(simname, dirname, spcname+"_bvt")
+    z, bvt = bvars[dirname, spcname+"_bvt"]
 
     nts = len(hrs)        # number of time slices 
 
     # create the plot
-    fig, ax = plt.subplots(1, 1, figsize=(8, 10))
+    fig = newfig(outtype, (8, 10))
+    ax  = fig.add_subplot(1, 1, 1)
 
     # plot the vertical profiles of budget rates at the specified time
-    plt.plot(bad[:, itime], z, color=colors[0], linestyle="-", linewidth=lnwdth, label="cns")
-    plt.plot(bch[:, itime], z, color=colors[3], linestyle="-", linewidth=lnwdth, label="chm")
-    plt.plot(bdp[:, itime], z, color=colors[4], linestyle="-", linewidth=lnwdth, label="dep")
-    plt.plot(bem[:, itime], z, color=colors[5], linestyle="-", linewidth=lnwdth, label="ems")
-    plt.plot(bvt[:, itime], z, color=colors[1], linestyle="-", linewidth=lnwdth, label="vtx")
+    ax.plot(bad, z, color=colors[0], linestyle="-", linewidth=lnwdth, label="cns")
+    ax.plot(bch, z, color=colors[3], linestyle="-", linewidth=lnwdth, label="chm")
+    ax.plot(bdp, z, color=colors[4], linestyle="-", linewidth=lnwdth, label="dep")
+    ax.plot(bem, z, color=colors[5], linestyle="-", linewidth=lnwdth, label="ems")
+    ax.plot(bvt, z, color=colors[1], linestyle="-", linewidth=lnwdth, label="vtx")
 
     # limit to specified height
     nz = len(z)
     if (zmax == -1.):
         zmax = z[nz-1]
-    plt.ylim(-0.1, zmax)
+    ax.set_ylim(-0.1, zmax)
     if (xmax != -1.):
-        plt.xlim(-0.1, xmax)
+        ax.set_xlim(-0.1, xmax)
 
     # draw line showing canopy height, if applicable
     if (zmax > hc):
         ahc = [hc, hc]
         xbnds = list(ax.get_xlim())
-        plt.plot(xbnds, ahc, color='0.25', linestyle='--', linewidth=lnwdth)
-        plt.xlim(xbnds[0], xbnds[1])
+        ax.plot(xbnds, ahc, color='0.25', linestyle='--', linewidth=lnwdth)
+        ax.set_xlim(xbnds[0], xbnds[1])
+
+    # set labels and title
+    ax.set_xlabel(varunits, fontsize=xfsize, labelpad=xlabpad)
+    ax.set_ylabel("z (m)", fontsize=yfsize, labelpad=ylabpad)
+    ax.set_title(spcname+"-"+simname+"-"+hrs[itime]+"LT", fontsize=tfsize, y=tyloc)
+
+    # set standard formatting
+    setstdfmts(ax, tlmaj, tlmin, tlbsize, tlbpad)
+
+    # add legend
+    ax.legend(loc=4, fontsize=lfsize, bbox_to_anchor=(0.99, 0.10))
+
+    # create output
+    pltoutput(simname, outfn, outtype, fig)
+
+    return fig
+
+
+def zintegral(z, var, zmax=-1.):
+    """Integrates profiles over height with the trapezoidal rule, for all times at once
+
+    Below a zmax between two levels, the profiles are interpolated linearly to
+    zmax for the last partial layer.
+
+    Args:
+       z    (numpy 1D array) : vertical levels (m)
+       var  (numpy array)    : profiles, heights along the second to last axis, e.g. (nz, ntimes)
+       zmax (float)          : top of the integration (m), -1. for the full column
+
+    Returns:
+       integ (numpy array)   : integrals over height (units of var times m), e.g. (ntimes)
+    """
+    if (zmax == -1. or zmax >= z[-1]):
+        return trapezoid(var, z, axis=-2)
+
+    nz = int(np.searchsorted(z, zmax, "right"))
+    if (nz == 0):
+        return np.zeros(var.shape[:-2]+var.shape[-1:])
+
+    if (nz > 1):
+        integ = trapezoid(var[..., :nz, :], z[:nz], axis=-2)
+    else:
+        integ = np.zeros(var.shape[:-2]+var.shape[-1:])
+    if (z[nz-1] < zmax):
+        frac = (zmax-z[nz-1])/(z[nz]-z[nz-1])
+        vtop = var[..., nz-1, :]+frac*(var[..., nz, :]-var[..., nz-1, :])
+        integ = integ+0.5*(var[..., nz-1, :]+vtop)*(zmax-z[nz-1])
+
+    return integ
+
+def integbudget(simname, spcname, zmax=-1., tstart=None, tend=None):
+    """Integrates the budget terms of a species over height for all output times
+
+    Args:
+       simname (str)             : ACCESS simulation name
+       spcname (str)             : species name
+       zmax    (float)           : top of the integration (m), e.g. hc for the canopy, -1. for the full column
+       tstart  (datetime or str) : start of a time window (optional)
+       tend    (datetime or str) : end of a time window (optional)
+
+    Returns:
+       integ (numpy 2D array)    : integrated terms (units of the terms times m), (nterm, ntimes),
+                                   terms as in bterms
+    """
+    spcnames, z, bud = getbudgets(simname, [spcname], tstart, tend)
+
+    return zintegral(z, bud[0], zmax)
+
+def getbudgetspcs(simname):
+    """Returns the species with all budget terms in the budget directory
+
+    Args:
+       simname (str)           : ACCESS simulation name
+
+    Returns:
+       spcnames (list(str))    : species names, in alphabetical order
+    """
+    fnames = set(os.listdir(os.getcwd()+"/"+simname+"/budget"))
+
+    spcnames = []
+    for fname in sorted(fnames):
+        if (fname.endswith("_"+bterms[0]+".dat")):
+            spcname = fname[:-len(bterms[0])-5]
+            if all(spcname+"_"+term+".dat" in fnames for term in bterms):
+                spcnames.append(spcname)
+
+    return spcnames
+
+def getbudgets(simname, spcnames=None, tstart=None, tend=None, nworkers=None):
+    """Reads the budget terms of many species concurrently as one array
+
+    Args:
+       simname  (str)             : ACCESS simulation name
+       spcnames (list(str))       : species, default is all with budget output
+       tstart   (datetime or str) : start of a time window (optional)
+       tend     (datetime or str) : end of a time window (optional)
+       nworkers (int)             : number of concurrent readers (optional)
+
+    Returns:
+       spcnames (list(str))       : species names
+       z (numpy 1D array)         : domain vertical levels (m)
+       bud (numpy 4D array)       : budget terms of shape (nspc, nterm, nz, ntimes), terms as in bterms
+    """
+    if (spcnames is None):
+        spcnames = getbudgetspcs(simname)
+
+    dirname = "budget"
+    names = [(dirname, spcname+"_"+term) for spcname in spcnames for term in bterms]
+    bvars = getvars(simname, names, None, tstart, tend, nworkers=nworkers)
+
+    z   = bvars[names[0]][0]
+    bud = np.stack([bvars[name][1] for name in names]).reshape((len(spcnames), len(bterms))+bvars[names[0]][1].shape)
+
+    return spcnames, z, bud
+
+def budgetsummary(simname, spcnames=None, hc=None, tstart=None, tend=None, outfn=None, nworkers=None):
+    """Computes budget diagnostics of many species over a simulation
+
+    All diagnostics are array operations over species, terms, heights and
+    times at once.  Integrals over the run use the trapezoidal rule, in z (m)
+    and time (s), so they have the units of the terms times m s.
+
+    Args:
+       simname  (str)             : ACCESS simulation name
+       spcnames (list(str))       : species, default is all with budget output
+       hc       (float)           : canopy height (m), for the canopy integrals (optional)
+       tstart   (datetime or str) : start of a time window (optional)
+       tend     (datetime or str) : end of a time window (optional)
+       outfn    (str)             : write the summary table to img/<simname>_<outfn>.csv (optional)
+       nworkers (int)             : number of concurrent readers (optional)
+
+    Returns:
+       summary (dict)             : with the keys
+          spcnames (list(str))    : species names
+          terms    (list(str))    : term labels, as in blabels
+          z        (array)        : domain vertical levels (m)
+          net      (array)        : net tendency, the sum of the terms, (nspc, nz, ntimes)
+          dominant (array)        : index of the term largest in magnitude, (nspc, nz, ntimes)
+          domfrac  (array)        : fraction of heights and times each term dominates, (nspc, nterm)
+          column   (array)        : column and run integrated terms, (nspc, nterm)
+          canopy   (array)        : canopy (below hc) and run integrated terms, (nspc, nterm), or None
+          table    (str)          : summary table, one line per species
+    """
+    spcnames, z, bud = getbudgets(simname, spcnames, tstart, tend, nworkers)
+
+    # seconds since the first output time in the window
+    dts, hrs = timekeys64(simname)
+    tw   = timewindow(simname, tstart, tend)
+    tsec = (dts[tw]-dts[tw][0]).astype("timedelta64[s]").astype(float)
+
+    net      = bud.sum(axis=1)
+    dominant = np.abs(bud).argmax(axis=1)
+    domfrac  = np.stack([(dominant == k).mean(axis=(1, 2)) for k in range(len(bterms))], axis=1)
+
+    def runintegral(zmax):
+        col = zintegral(z, bud, zmax)
+        return trapezoid(col, tsec, axis=2) if (len(tsec) > 1) else col[:, :, 0]
+
+    column = runintegral(-1.)
+    canopy = None
+    if (hc is not None):
+        canopy = runintegral(hc)
+
+    # summary table
+    cols  = ["species"]+["col_"+label for label in blabels]+["col_net"]
+    if (canopy is not None):
+        cols+= ["can_"+label for label in blabels]+["can_net"]
+    cols += ["dominant", "domfrac"]
+    lines = [",".join(cols)]
+    for i, spcname in enumerate(spcnames):
+        vals = list(column[i])+[column[i].sum()]
+        if (canopy is not None):
+            vals+= list(canopy[i])+[canopy[i].sum()]
+        kdom = int(domfrac[i].argmax())
+        lines.append(",".join([spcname]+["%.6e" % val for val in vals]+[blabels[kdom], "%.3f" % domfrac[i, kdom]]))
+    table = "\n".join(lines)+"\n"
+
+    if (outfn is not None):
+        with open(os.getcwd()+"/img/"+simname+"_"+outfn+".csv", "w") as fh:
+            fh.write(table)
+
+    return {"spcnames": spcnames, "terms": list(blabels), "z": z, "net": net, "dominant": dominant,
+            "domfrac": domfrac, "column": column, "canopy": canopy, "table": table}
+
+###########################################################################################################
+# plotsummary - create a figure of the integrated budget terms of many species
+#
+def plotsummary(simname, summary, outtype, outfn, varunits="", canopy=False):
+    """Create a one-panel figure of the run integrated budget terms of each species,
+       as horizontal bars, with the net tendency marked
+
+    Args:
+       simname  (str)   : ACCESS simulation name
+       summary  (dict)  : diagnostics from budgetsummary
+       outtype  (str)   : either 'pdf', 'png', or 'x11'
+       outfn    (str)   : string for output file name
+       varunits (str)   : units string for x-axis label
+       canopy   (bool)  : plot the canopy integrals instead of the column integrals
+
+    Returns:
+       fig (obj)        : matplotlib Figure
+    """
+    integ = summary["canopy"] if canopy else summary["column"]
+    if (integ is None):
+        print("No canopy integrals, budgetsummary needs hc!")
+        return 1
+    spcnames = summary["spcnames"]
+    nspc = len(spcnames)
+    nterm = len(blabels)
+
+    # create the plot
+    fig = newfig(outtype, (10, 2+1.2*nspc))
+    ax  = fig.add_subplot(1, 1, 1)
+
+    # one bar per term for each species, and the net tendency
+    y = np.arange(nspc)
+    height = 0.8/nterm
+    for k in range(nterm):
+        ax.barh(y-0.4+(k+0.5)*height, integ[:, k], height=height, color=bcolors[k], label=blabels[k])
+    ax.plot(integ.sum(axis=1), y, color="black", marker="D", linestyle="none", label="net")
+    ax.axvline(0., color="0.25", linewidth=lnwdth)
 
     # set labels and title
-    plt.xlabel(varunits, fontsize=xfsize, labelpad=xlabpad)
-    plt.ylabel("z (m)", fontsize=yfsize, labelpad=ylabpad)
-    plt.title(spcname+"-"+simname+"-"+hrs[itime]+"LT", fontsize=tfsize, y=tyloc)
+    ax.set_yticks(y)
+    ax.set_yticklabels(spcnames)
+    ax.invert_yaxis()
+    ax.set_xlabel(varunits, fontsize=xfsize, labelpad=xlabpad)
+    ax.set_title(("Canopy" if canopy else "Column")+" budget - "+simname, fontsize=tfsize, y=tyloc)
 
     # set standard formatting
     setstdfmts(ax, tlmaj, tlmin, tlbsize, tlbpad)
 
     # add legend
-    plt.legend(loc=4, fontsize=lfsize, bbox_to_anchor=(0.99, 0.10))
+    ax.legend(loc=4, fontsize=lfsize, bbox_to_anchor=(0.99, 0.02))
 
     # create output
-    pltoutput(simname, outfn, outtype)
+    pltoutput(simname, outfn, outtype, fig)
+
+    return fig
 
-    return
+###########################################################################################################
+# plotts - create a time series figure of the height integrated budget rates of a species
+#
+def plotts(simname, spcname, varunits, outtype, outfn, zmax=-1., tstart=None, tend=None):
+    """Create a time series figure of the budget rates for a defined species variable
+       integrated over height, for all output times at once
+
+    Args:
+       simname  (str)      : ACCESS simulation name
+       spcname  (str)      : name of species plotted
+       varunits (str)      : units string for y-axis label (units of the terms times m)
+       outtype  (str)      : either 'pdf', 'png', or 'x11'
+       outfn    (str)      : string for output file name
+       zmax     (float)    : top of the integration (m), e.g. hc for the canopy, -1. for the full column
+       tstart   (datetime) : start of a time window to plot, or "YYYY-MM-DD HH:MM:SS" (optional)
+       tend     (datetime) : end of a time window to plot (optional)
+
+    Returns:
+       fig (obj)           : matplotlib Figure
+    """
+    # read elapsed hour/datetime key file
+    dts, hrs = timekeys(simname, tstart, tend)
+
+    # all five terms from one read, integrated for all times
+    integ = integbudget(simname, spcname, zmax, tstart, tend)
+
+    if (zmax == -1.):
+        plttitle = spcname+" column budget"
+    else:
+        plttitle = spcname+" budget below "+str(zmax)+" m"
 
+    return plottsdata(simname, dts, list(integ), blabels, varunits, plttitle, "line", bcolors, outtype, outfn,
+                      legbbox=(0.99, 0.02))
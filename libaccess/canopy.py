@@ -5,35 +5,94 @@
 # Rick D. Saylor, July 2018
 #
 import os
-from matplotlib import use
-use("WXAgg")
-import matplotlib.pylab as plt
 import numpy as np
-import seaborn as sns
-from .pltutils import pltoutput, timekeys, get1Dvar, setstdfmts
-
-# set colors
-colors = ["gray", "peru", "brown", "red", "royalblue", "green", "violet", "magenta", "cyan", "olive"]
-
-# set common figure formatting parameters
-tfsize   = 18     # plot title font size
-tyloc    = 1.02   # plot title y location
-lfsize   = 14     # legend font size
-yfsize   = 18     # y-axis title font size
-ylabpad  = 10     # y-axis title padding
-xfsize   = 18     # x-axis title font size
-xlabpad  = 10     # x-axis title padding
-tlmaj    =  6     # major tick length
-tlmin    =  4     # minor tick length
-tlbsize  = 17     # tick label font size
-tlbpad   =  3     # tick label padding
-lnwdth   = 1.5    # linewidth
+from .datacache import filestamp
+from .memcache import getmem, putmem
+from .pltutils import loaddat, getvars, timekeys
+from .panels import plotpanels
+from .tseries import plottsdata
+
+def getlai(simname, nz=None):
+    """Reads the leaf area profile of an ACCESS simulation (cached)
+
+    Args:
+       simname (str)          : ACCESS simulation name
+       nz      (int)          : number of levels to return, levels beyond those
+                                in the file have no leaves (optional)
+
+    Returns:
+       lai  (numpy 1D array)  : leaf area index of each level (m2 m-2)
+       clai (numpy 1D array)  : cumulative leaf area index from the canopy top (m2 m-2)
+    """
+    fnlai = os.getcwd()+"/"+simname+"/canopy/laiprof.dat"
+
+    key = ("getlai", fnlai, filestamp(fnlai))
+    cached = getmem(key)
+    if (cached is None):
+        dat = loaddat(fnlai, usecols=[1, 2])
+        cached = putmem(key, (dat[:, 0].copy(), dat[:, 1].copy()))
+    lai, clai = cached
+
+    if (nz is not None and nz != len(lai)):
+        lai  = np.concatenate((lai[:nz], np.zeros(max(0, nz-len(lai)))))
+        clai = np.concatenate((clai[:nz], np.zeros(max(0, nz-len(clai)))))
+
+    return lai, clai
+
+def canopyints(simname, varnames, mean=False, tstart=None, tend=None):
+    """Integrates canopy variables over the leaf area, for all output times at once
+
+    A variable with sunlit and shaded output (e.g., "anet", "gs", "rabs") is
+    weighted by the sun and shade fractions of each level, fsun*Xsun+fshd*Xshd,
+    and any other canopy variable (e.g., "gswgt", "tlsun") is used as is.  The
+    canopy total is the sum over levels weighted by their leaf area, a single
+    product for all times.
+
+    Args:
+       simname  (str)             : ACCESS simulation name
+       varnames (list(str))       : canopy variable names, or base names of sun/shade pairs
+       mean     (bool)            : return the leaf area weighted mean instead of the total
+       tstart   (datetime or str) : start of a time window (optional)
+       tend     (datetime or str) : end of a time window (optional)
+
+    Returns:
+       ints (dict)                : canopy totals (per unit ground area) or means by varname,
+                                    one value per output time
+    """
+    cdir = os.getcwd()+"/"+simname+"/canopy/"
+
+    # read everything needed at once
+    pairs = {varname: not os.path.exists(cdir+varname+".dat") and os.path.exists(cdir+varname+"sun.dat")
+             for varname in varnames}
+    names = []
+    for varname in varnames:
+        for name in ([varname+"sun", varname+"shd", "fsun", "fshd"] if pairs[varname] else [varname]):
+            if (("canopy", name) not in names):
+                names.append(("canopy", name))
+    cvars = getvars(simname, names, tstart=tstart, tend=tend)
+
+    z, var = cvars[names[0]]
+    lai, clai = getlai(simname, len(z))
+    if mean:
+        lai = lai/lai.sum()
+
+    ints = {}
+    for varname in varnames:
+        if pairs[varname]:
+            fsun = cvars["canopy", "fsun"][1]
+            fshd = cvars["canopy", "fshd"][1]
+            var  = fsun*cvars["canopy", varname+"sun"][1] + fshd*cvars["canopy", varname+"shd"][1]
+        else:
+            var  = cvars["canopy", varname][1]
+        ints[varname] = lai @ var
+
+    return ints
 
 ########################################################################################################
 # plotall3 - create a figure for sunlit, shaded and weighted canopy variable
 #            (PPFD, NIR, Rabs, Tleaf, gs, or Anet)
 #
-def plotall3(simname, varname, outtype, intdt, hmax, hc):
+def plotall3(simname, varname, outtype, intdt, hmax, hc, tstart=None, tend=None):
     """Create a 3 panel figure for a canopy variable for the sunlit, shaded
        and weighted fractions
 
@@ -44,9 +103,11 @@ def plotall3(simname, varname, outtype, intdt, hmax, hc):
        intdt    (int)   : time step interval for plotting profiles
        hmax     (float) : height of the top of the domain (m)
        hc       (float) : height of the top of the canopy (m)
-  
+       tstart   (datetime) : start of a time window to plot, or "YYYY-MM-DD HH:MM:SS" (optional)
+       tend     (datetime) : end of a time window to plot (optional)
+
     Returns:
-       Nothing
+       fig (obj)           : matplotlib Figure, or 1 if varname is unknown
     """
     # link varname with appropriate units and plot title strings
     if  (varname == "ppfd"):
@@ -77,114 +138,17 @@ def plotall3(simname, varname, outtype, intdt, hmax, hc):
         print("Unknown canopy variable!")
         return 1
 
-    # read elapsed hour/datetime key file
-    dts, hrs = timekeys(simname)
-
-    # get data for sunlit var
-    z, varsun = get1Dvar(simname, "canopy", varname+"sun")
-
-    # get data for shaded var
-    z, varshd = get1Dvar(simname, "canopy", varname+"shd")
-
-    # get data for weighted var
-    z, varwgt = get1Dvar(simname, "canopy", varname+"wgt")
-
-    # create the plot 
-    fig = plt.figure(figsize=(16, 10))
-
-    nts = varsun.shape[1]      # number of time slices
-
-    ###################
-    # sunlit var plot
-    ###################
-    ax = plt.subplot(1, 3, 1)
-    ic = 0                     # color array index
-
-    # draw a vertical profile for each intdt time
-    for m in range(nts):
-        if ( (m % intdt) == 0):
-            labstr = hrs[m]
-            plt.plot(varsun[:, m], z, color=colors[ic], linestyle="-", linewidth=lnwdth, label=labstr)
-            ic+=1
-            if (ic > len(colors)-1):    # cycle back through the colors
-                ic = 0
-
-    # limit to canopy height
-    plt.ylim(-0.1, hc)
-
-    # set labels and title
-    plt.xlabel(varunits, fontsize=xfsize, labelpad=xlabpad)
-    plt.ylabel("z (m)", fontsize=yfsize, labelpad=ylabpad)
-    plt.title("sunlit", fontsize=tfsize, y=tyloc)
-
-    # set standard formatting
-    setstdfmts(ax, tlmaj, tlmin, tlbsize, tlbpad)
-
-    ###################
-    # shaded var plot
-    ###################
-    ax = plt.subplot(1, 3, 2)
-    ic = 0                     # color array index
-
-    # draw a vertical profile for each intdt time
-    for m in range(nts):
-        if ( (m % intdt) == 0):
-            labstr = hrs[m]
-            plt.plot(varshd[:, m], z, color=colors[ic], linestyle="-", linewidth=lnwdth, label=labstr)
-            ic+=1
-            if (ic > len(colors)-1):    # cycle back through the colors
-                ic = 0
-
-    # limit to canopy height
-    plt.ylim(-0.1, hc)
-
-    # set labels and title
-    plt.xlabel(varunits, fontsize=xfsize, labelpad=xlabpad)
-    plt.title("shaded", fontsize=tfsize, y=tyloc)
-
-    # set standard formatting
-    setstdfmts(ax, tlmaj, tlmin, tlbsize, tlbpad)
-
-    ###################
-    # weighted var plot
-    ###################
-    ax = plt.subplot(1, 3, 3)
-    ic = 0                     # color array index
-
-    # draw a vertical profile for each intdt time
-    for m in range(nts):
-        if ( (m % intdt) == 0):
-            labstr = hrs[m]
-            plt.plot(varwgt[:, m], z, color=colors[ic], linestyle="-", linewidth=lnwdth, label=labstr)
-            ic+=1
-            if (ic > len(colors)-1):    # cycle back through the colors
-                ic = 0
+    specs = [{"dirname": "canopy", "varname": varname+"sun", "varunits": varunits, "vartitle": "sunlit", "ztop": hc},
+             {"dirname": "canopy", "varname": varname+"shd", "varunits": varunits, "vartitle": "shaded", "ztop": hc},
+             {"dirname": "canopy", "varname": varname+"wgt", "varunits": varunits, "vartitle": "weighted", "ztop": hc}]
 
-    # limit to canopy height
-    plt.ylim(-0.1, hc)
-
-    # set labels and title
-    plt.xlabel(varunits, fontsize=xfsize, labelpad=xlabpad)
-    plt.title("weighted", fontsize=tfsize, y=tyloc)
-
-    # set standard formatting
-    setstdfmts(ax, tlmaj, tlmin, tlbsize, tlbpad)
-
-    # add the legend (only on the last plot)
-    plt.legend(loc=4, fontsize=lfsize, bbox_to_anchor=(0.55, 0.01))
-
-    # add super title
-    plt.suptitle(simname+"-"+vartitle, fontsize=tfsize, x=0.5, y=0.97)
-
-    # create output
-    pltoutput(simname, varname, outtype)
-
-    return
+    return plotpanels(simname, specs, outtype, varname, intdt, suptitle=simname+"-"+vartitle, legbbox=(0.55, 0.01),
+                      tstart=tstart, tend=tend)
 
 ########################################################################################################
 # plotsun - create a figure for sunlit & shaded canopy fractions
 #
-def plotsun(simname, outtype, intdt, hmax, hc):
+def plotsun(simname, outtype, intdt, hmax, hc, tstart=None, tend=None):
     """Create a 2 panel figure for the sunlit and shaded canopy fractions
 
     Args:
@@ -193,90 +157,22 @@ def plotsun(simname, outtype, intdt, hmax, hc):
        intdt    (int)  : time step interval for plotting profiles
        hmax     (float) : height of the top of the domain (m)
        hc       (float) : height of the top of the canopy (m)
+       tstart   (datetime) : start of a time window to plot, or "YYYY-MM-DD HH:MM:SS" (optional)
+       tend     (datetime) : end of a time window to plot (optional)
 
     Returns:
-       Nothing
+       fig (obj)           : matplotlib Figure
     """
-    # read elapsed hour/datetime key file
-    dts, hrs = timekeys(simname)
-
-    # get data for sunlit fraction
-    z, fsun = get1Dvar(simname, "canopy", "fsun")
-
-    # get data for shaded fraction
-    z, fshd = get1Dvar(simname, "canopy", "fshd")
-
-    # create the plot
-    fig = plt.figure(figsize=(12, 10))
-
-    nts = fsun.shape[1]      # number of time slices
-
-    #######################
-    # sunlit fraction plot
-    #######################
-    ax = plt.subplot(1, 2, 1)
-    ic = 0    # color array index
-
-    # draw a vertical profile for each intdt time
-    for m in range(nts):
-        if ( (m % intdt) == 0):
-            labstr = hrs[m]
-            plt.plot(fsun[:, m], z, color=colors[ic], linestyle="-", linewidth=lnwdth, label=labstr)
-            ic+=1
-            if (ic > len(colors)-1):    # cycle back through the colors
-                ic = 0
-
-    # limit to canopy height
-    plt.ylim(-0.1, hc)
-
-    # set labels and title
-    plt.xlabel("fraction", fontsize=xfsize, labelpad=xlabpad)
-    plt.ylabel("z (m)", fontsize=yfsize, labelpad=ylabpad)
-    plt.title("sunlit", fontsize=tfsize, y=tyloc)
-
-    # set standard formatting
-    setstdfmts(ax, tlmaj, tlmin, tlbsize, tlbpad)
-
-    #######################
-    # shaded fraction plot
-    #######################
-    ax = plt.subplot(1, 2, 2)
-    ic = 0    # color array index
+    specs = [{"dirname": "canopy", "varname": "fsun", "varunits": "fraction", "vartitle": "sunlit", "ztop": hc},
+             {"dirname": "canopy", "varname": "fshd", "varunits": "fraction", "vartitle": "shaded", "ztop": hc}]
 
-    # draw a vertical profile for each intdt time
-    for m in range(nts):
-        if ( (m % intdt) == 0):
-            labstr = hrs[m]
-            plt.plot(fshd[:, m], z, color=colors[ic], linestyle="-", linewidth=lnwdth, label=labstr)
-            ic+=1
-            if (ic > len(colors)-1):    # cycle back through the colors
-                ic = 0
-
-    # limit to canopy height
-    plt.ylim(-0.1, hc)
-
-    # set labels and title
-    plt.xlabel("fraction", fontsize=xfsize, labelpad=xlabpad)
-    plt.title("shaded", fontsize=tfsize, y=tyloc)
-
-    # set standard formatting
-    setstdfmts(ax, tlmaj, tlmin, tlbsize, tlbpad)
-
-    # add the legend (on the last plot only)
-    plt.legend(loc=4, fontsize=lfsize, bbox_to_anchor=(0.55, 0.01))
-
-    # add the super title
-    plt.suptitle(simname+"-Sun/Shade", fontsize=tfsize, x=0.5, y=0.99)
-    
-    # create output
-    pltoutput(simname, "sunshd", outtype)
-
-    return
+    return plotpanels(simname, specs, outtype, "sunshd", intdt, suptitle=simname+"-Sun/Shade", supy=0.99,
+                      legbbox=(0.55, 0.01), tstart=tstart, tend=tend)
 
 ########################################################################################################
 # plotlw - create a figure for upwelling and downwelling long-wave radiation
 #
-def plotlw(simname, outtype, intdt, hmax, hc):
+def plotlw(simname, outtype, intdt, hmax, hc, tstart=None, tend=None):
     """Create a 2 panel figure for the upwelling and downwelling longwave radiation
 
     Args:
@@ -285,83 +181,47 @@ def plotlw(simname, outtype, intdt, hmax, hc):
        intdt    (int)  : time step interval for plotting profiles
        hmax     (float) : height of the top of the domain (m)
        hc       (float) : height of the top of the canopy (m)
+       tstart   (datetime) : start of a time window to plot, or "YYYY-MM-DD HH:MM:SS" (optional)
+       tend     (datetime) : end of a time window to plot (optional)
 
     Returns:
-       Nothing
+       fig (obj)           : matplotlib Figure
     """
-    # read elapsed hour/datetime key file
-    dts, hrs = timekeys(simname)
-
-    # get data for LW up
-    z, lwup = get1Dvar(simname, "canopy", "lwup")
-
-    # get data for LW down
-    z, lwdn = get1Dvar(simname, "canopy", "lwdn")
+    swm2 = "W m$^{-2}$"
+    specs = [{"dirname": "canopy", "varname": "lwup", "varunits": swm2, "vartitle": "LW Up", "ztop": hc},
+             {"dirname": "canopy", "varname": "lwdn", "varunits": swm2, "vartitle": "LW Down", "ztop": hc}]
 
-    # create the plot
-    fig = plt.figure(figsize=(12, 10))
+    return plotpanels(simname, specs, outtype, "lw", intdt, suptitle=simname, supy=0.99,
+                      legbbox=(0.55, 0.01), tstart=tstart, tend=tend)
 
-    nts = lwdn.shape[1]    # number of time slices
+########################################################################################################
+# plotts - create a time series figure of canopy integrated variables
+#
+def plotts(simname, varnames, varlabels, varunits, plttitle, scolors, outtype, outfn, mean=False,
+           tstart=None, tend=None):
+    """Create a time series figure of canopy variables integrated over the leaf area,
+       e.g. whole-canopy net assimilation (varnames=["anet"]) or conductance (["gs"])
 
-    ################
-    # LW up plot
-    ################
-    ax = plt.subplot(1, 2, 1)
-    ic = 0                 # color array index
+    Args:
+       simname   (str)       : ACCESS simulation name
+       varnames  list(str)   : canopy variable names, or base names of sun/shade pairs
+       varlabels list(str)   : labels for the variables
+       varunits  (str)       : units string for y-axis label
+       plttitle  (str)       : title for the plot
+       scolors   list(str)   : color names of the lines
+       outtype   (str)       : either 'pdf', 'png', or 'x11'
+       outfn     (str)       : string for output file name
+       mean      (bool)      : plot leaf area weighted means instead of canopy totals
+       tstart    (datetime)  : start of a time window to plot, or "YYYY-MM-DD HH:MM:SS" (optional)
+       tend      (datetime)  : end of a time window to plot (optional)
 
-    # draw a vertical profile for each intdt time
-    for m in range(nts):
-        if ( (m % intdt) == 0):
-            labstr = hrs[m]
-            plt.plot(lwup[:, m], z, color=colors[ic], linestyle="-", linewidth=lnwdth, label=labstr)
-            ic+=1
-            if (ic > len(colors)-1):    # cycle back through the colors
-                ic = 0
+    Returns:
+       fig (obj)             : matplotlib Figure
+    """
+    # read elapsed hour/datetime key file
+    dts, hrs = timekeys(simname, tstart, tend)
 
-    # limit to canopy height
-    plt.ylim(-0.1, hc)
+    ints = canopyints(simname, varnames, mean, tstart, tend)
 
-    # set labels and title
-    swm2 = "W m$^{-2}$"
-    plt.xlabel(swm2, fontsize=xfsize, labelpad=xlabpad)
-    plt.ylabel("z (m)", fontsize=yfsize, labelpad=ylabpad)
-    plt.title("LW Up", fontsize=tfsize, y=tyloc)
-
-    # set standard formatting
-    setstdfmts(ax, tlmaj, tlmin, tlbsize, tlbpad)
-
-    ################
-    # LW down plot
-    ################
-    ax = plt.subplot(1, 2, 2)
-    ic = 0    # color array index
-
-    # draw a vertical profile for each intdt time
-    for m in range(nts):
-        if ( (m % intdt) == 0):
-            labstr = hrs[m]
-            plt.plot(lwdn[:, m], z, color=colors[ic], linestyle="-", linewidth=lnwdth, label=labstr)
-            ic+=1
-            if (ic > len(colors)-1):    # cycle back through the colors
-                ic = 0
-
-    # limit to canopy height
-    plt.ylim(-0.1, hc)
-
-    # set labels and title
-    plt.xlabel(swm2, fontsize=xfsize, labelpad=xlabpad)
-    plt.title("LW Down", fontsize=tfsize, y=tyloc)
-
-    # set standard formatting
-    setstdfmts(ax, tlmaj, tlmin, tlbsize, tlbpad)
-
-    # add the legend (only on the last plot)
-    plt.legend(loc=4, fontsize=lfsize, bbox_to_anchor=(0.55, 0.01))
-
-    # add the super title
-    plt.suptitle(simname, fontsize=tfsize, x=0.5, y=0.99)
-    
-    # create output
-    pltoutput(simname, "lw", outtype)
-
-    return 0
+    return plottsdata(simname, dts, [ints[varname] for varname in varnames], varlabels, varunits, plttitle,
+                      "line", scolors, outtype, outfn)
@@ -0,0 +1,268 @@
+#==================================================================================================
+# datacache.py - persistent binary cache of parsed ACCESS output files
+#
+# Parsed arrays are kept as .npy files in a sidecar directory under <simname>/ so
+# that re-reading a simulation costs a memory-map instead of a full text parse.
+#
+import os
+import threading
+import numpy as np
+
+cachedir = ".npcache"     # name of the sidecar cache directory under <simname>/
+usecache = True           # global switch for reading/writing the cache
+
+def setdiskcache(enabled):
+    """Turns the on-disk cache of parsed output files on or off
+
+    Args:
+       enabled (bool)  : True to use the cache, False to always parse the text files
+
+    Returns:
+       Nothing
+    """
+    global usecache
+    usecache = enabled
+
+    return
+
+def getcachedir(simname, dirname=None):
+    """Returns the path of the cache directory for an ACCESS simulation
+
+    Args:
+       simname (str)  : ACCESS simulation name
+       dirname (str)  : name of the simulation output directory (optional)
+
+    Returns:
+       cdir (str)     : path of the cache directory
+    """
+    cdir = os.getcwd()+"/"+simname+"/"+cachedir
+    if (dirname is not None):
+        cdir = cdir+"/"+dirname
+
+    return cdir
+
+def cachename(varname, dtype):
+    """Returns the name of the cache entry of a variable parsed as a given dtype
+
+    Entries parsed as float64 keep the plain variable name, so each dtype has
+    its own entry and no conversion is needed when it is read.
+
+    Args:
+       varname (str)    : variable name
+       dtype   (dtype)  : numpy float dtype of the parsed data
+
+    Returns:
+       name (str)       : name of the cache entry, e.g. "tk" or "tk.float32"
+    """
+    dtype = np.dtype(dtype)
+    if (dtype == np.float64):
+        return varname
+
+    return varname+"."+dtype.name
+
+def filestamp(fname):
+    """Returns the modification time and size identifying a version of a file
+
+    Args:
+       fname (str)      : path of the file
+
+    Returns:
+       stamp (str)      : "mtime_ns size" string, or None if the file does not exist
+    """
+    try:
+        st = os.stat(fname)
+    except OSError:
+        return None
+
+    return str(st.st_mtime_ns)+" "+str(st.st_size)
+
+def loadcache(simname, dirname, varname, fnvar, keys, stamp=None):
+    """Memory-maps the cached arrays for an output file, if they are current
+
+    The entry is only used if the modification time and size recorded when it
+    was written match those of the source file, or if the source file no longer
+    exists (e.g., a simulation archived as a converted store only).
+
+    Args:
+       simname (str)        : ACCESS simulation name
+       dirname (str)        : name of the simulation output directory
+       varname (str)        : variable name
+       fnvar   (str)        : path of the source .dat file
+       keys    (list(str))  : names of the arrays stored for this entry
+       stamp   (str)        : stamp identifying the source, default is that of fnvar
+
+    Returns:
+       arrays (dict)        : read-only memory-mapped arrays by key, or None
+    """
+    if (not usecache):
+        return None
+
+    base = getcachedir(simname, dirname)+"/"+varname
+
+    if (stamp is None):
+        stamp = filestamp(fnvar)
+    try:
+        with open(base+".stamp") as fh:
+            if (stamp is not None and fh.read() != stamp):
+                return None
+        arrays = {}
+        for key in keys:
+            arrays[key] = np.load(base+"."+key+".npy", mmap_mode="r")
+    except (OSError, ValueError):
+        return None
+
+    return arrays
+
+def canwrite(simname, dirname=None):
+    """Tells whether cache entries can be written for an ACCESS simulation
+
+    Args:
+       simname (str)    : ACCESS simulation name
+       dirname (str)    : name of the simulation output directory (optional)
+
+    Returns:
+       ok (bool)        : True if the cache is in use and its directory is, or
+                          can be created, writable
+    """
+    if (not usecache):
+        return False
+
+    path = getcachedir(simname, dirname)
+    while (not os.path.isdir(path)):
+        parent = os.path.dirname(path)
+        if (parent == path):
+            return False
+        path = parent
+
+    return os.access(path, os.W_OK)
+
+def savecache(simname, dirname, varname, fnvar, arrays, stamp=None):
+    """Writes parsed arrays for an output file to the cache, if it is in use
+
+    Failures (e.g., a read-only simulation directory) are ignored and simply
+    leave the file uncached.
+
+    Args:
+       simname (str)    : ACCESS simulation name
+       dirname (str)    : name of the simulation output directory
+       varname (str)    : variable name
+       fnvar   (str)    : path of the source .dat file
+       arrays  (dict)   : numpy arrays to store by key
+       stamp   (str)    : stamp identifying the source, default is that of fnvar
+
+    Returns:
+       Nothing
+    """
+    if (not usecache):
+        return
+
+    try:
+        writeentry(simname, dirname, varname, fnvar, arrays, stamp)
+    except OSError:
+        pass
+
+    return
+
+def openarray(simname, dirname, varname, key, shape, dtype):
+    """Creates a cache array on disk to be filled in place
+
+    For arrays too large to build in memory: the array is a memory-mapped
+    temporary file, which becomes part of the entry when it is passed to
+    writeentry (or savecache).  The entry is not current until then.
+
+    Args:
+       simname (str)    : ACCESS simulation name
+       dirname (str)    : name of the simulation output directory
+       varname (str)    : variable name
+       key     (str)    : name of the array in the entry
+       shape   (tuple)  : shape of the array
+       dtype   (dtype)  : numpy dtype of the array
+
+    Returns:
+       arr (memmap)     : writable memory-mapped array
+    """
+    cdir = getcachedir(simname, dirname)
+    base = cdir+"/"+varname
+
+    os.makedirs(cdir, exist_ok=True)
+    if os.path.exists(base+".stamp"):
+        os.remove(base+".stamp")
+    tmpfn = base+"."+key+"."+str(os.getpid())+"-"+str(threading.get_ident())+".tmp.npy"
+
+    return np.lib.format.open_memmap(tmpfn, mode="w+", dtype=dtype, shape=shape)
+
+def writeentry(simname, dirname, varname, fnvar, arrays, stamp=None):
+    """Writes the arrays for an output file to the cache directory
+
+    The stamp file is written last, so an interrupted write never produces an
+    entry that looks current.  Arrays from openarray are moved into place
+    rather than copied.
+
+    Args:
+       simname (str)    : ACCESS simulation name
+       dirname (str)    : name of the simulation output directory
+       varname (str)    : variable name
+       fnvar   (str)    : path of the source .dat file
+       arrays  (dict)   : numpy arrays to store by key
+       stamp   (str)    : stamp identifying the source, default is that of fnvar
+
+    Returns:
+       stamp (str)      : stamp of the source file recorded for the entry
+    """
+    cdir = getcachedir(simname, dirname)
+    base = cdir+"/"+varname
+
+    if (stamp is None):
+        stamp = filestamp(fnvar)
+    os.makedirs(cdir, exist_ok=True)
+    if os.path.exists(base+".stamp"):
+        os.remove(base+".stamp")
+    for key, arr in arrays.items():
+        tmpfn = base+"."+key+"."+str(os.getpid())+"-"+str(threading.get_ident())+".tmp.npy"
+        if (isinstance(arr, np.memmap) and arr.filename == os.path.abspath(tmpfn)):
+            arr.flush()
+        else:
+            np.save(tmpfn, arr)
+        os.replace(tmpfn, base+"."+key+".npy")
+    with open(base+".stamp", "w") as fh:
+        fh.write(stamp)
+
+    return stamp
+
+def readstamp(simname, dirname, varname):
+    """Returns the source file stamp recorded for a cache entry
+
+    Args:
+       simname (str)    : ACCESS simulation name
+       dirname (str)    : name of the simulation output directory
+       varname (str)    : variable name
+
+    Returns:
+       stamp (str)      : recorded stamp, or None if there is no entry
+    """
+    try:
+        with open(getcachedir(simname, dirname)+"/"+varname+".stamp") as fh:
+            return fh.read()
+    except OSError:
+        return None
+
+def clearcache(simname, dirname=None):
+    """Removes cached arrays for an ACCESS simulation
+
+    Args:
+       simname (str)  : ACCESS simulation name
+       dirname (str)  : only clear this simulation output directory (optional)
+
+    Returns:
+       nfiles (int)   : number of cache files removed
+    """
+    cdir = getcachedir(simname, dirname)
+
+    nfiles = 0
+    for root, dirs, files in os.walk(cdir, topdown=False):
+        for fname in files:
+            os.remove(os.path.join(root, fname))
+            nfiles+=1
+        os.rmdir(root)
+
+    return nfiles
@@ -0,0 +1,309 @@
+#==================================================================================================
+# follow.py - incremental reading of the output of a running ACCESS simulation
+#
+# The state parsed from each followed file is kept between polls, and only the
+# lines appended to time only files (and ACCESS_timekey.dat) or the columns
+# added to height-time files since the last poll are parsed.  The results are
+# placed in the in-process cache under the keys used by the pltutils readers,
+# so the plotting functions pick up the current data without parsing anything,
+# replacing the entries placed by the last poll.
+#
+import os
+import time
+import threading
+import numpy as np
+from datetime import datetime
+from .datacache import filestamp
+from .memcache import putmem, discardmem
+from .pltutils import getdtype
+
+tails = {}                 # parsed state of each followed file, by path
+lastkeys = {}              # in-process cache key last used for each followed file and reader
+
+lock = threading.Lock()
+
+def taillines(fname, restart=False):
+    """Reads the complete lines appended to a file since the last call
+
+    Args:
+       fname   (str)      : path of the file
+       restart (bool)     : read the file from its start again
+
+    Returns:
+       tail (dict)        : state of the file, a new one without parsed data if
+                            reading started over (first call, or the file was replaced)
+       lines (list(str))  : lines appended since the last call
+    """
+    tail = tails.get(fname)
+
+    with open(fname, "rb") as fh:
+        size = os.fstat(fh.fileno()).st_size
+        if (restart or tail is None or size < tail["offset"]):
+            # start after the header line
+            fh.readline()
+            tail = {"offset": fh.tell()}
+        fh.seek(tail["offset"])
+        chunk = fh.read()
+
+    # only return complete lines, a partly written last line is read next time
+    lines  = []
+    nbytes = chunk.rfind(b"\n")+1
+    if (nbytes > 0):
+        lines = [line for line in chunk[:nbytes].decode().split("\n") if line.strip()]
+        tail["offset"]+=nbytes
+    tails[fname] = tail
+
+    return tail, lines
+
+def growbuf(buf, n, nts, shape, dtype):
+    """Returns a buffer with room for nts output times along its last axis
+
+    The buffer grows geometrically, so appending output times stays cheap.
+
+    Args:
+       buf   (numpy array) : current buffer, or None
+       n     (int)         : number of output times already in the buffer
+       nts   (int)         : number of output times needed
+       shape (tuple)       : shape of the buffer without its last axis
+       dtype (dtype)       : numpy float dtype of the buffer
+
+    Returns:
+       buf (numpy array)   : buf itself if it is large enough, otherwise a larger copy
+    """
+    if (buf is not None and buf.shape[-1] >= nts):
+        return buf
+
+    newbuf = np.empty(shape+(max(nts, 2*n, 16),), dtype=dtype)
+    if (buf is not None):
+        newbuf[..., :n] = buf[..., :n]
+
+    return newbuf
+
+def replacemem(key, value):
+    """Stores the current data of a followed file in the in-process cache
+
+    The entry stored for the same file and reader by the last poll is dropped,
+    so superseded data do not use up the memory budget.
+
+    Args:
+       key   (tuple) : cache key of the reader, (reader, path, stamp, ...)
+       value (obj)   : data as returned by the reader
+
+    Returns:
+       value (obj)   : the (now read-only) value
+    """
+    lastkey = lastkeys.get(key[:2])
+    if (lastkey is not None and lastkey != key):
+        discardmem(lastkey)
+    lastkeys[key[:2]] = key
+
+    return putmem(key, value)
+
+def parsetimekeys(lines):
+    """Converts lines of ACCESS_timekey.dat to (datetime, hour string) rows
+
+    Args:
+       lines (list(str))  : lines of the timekey file
+
+    Returns:
+       rows (list(tuple)) : (datetime, hour string) of each line
+    """
+    rows = []
+    for line in lines:
+        data = line.split()
+        rows.append((datetime.strptime(data[1]+" "+data[2], "%Y-%m-%d %H:%M:%S"), data[2][0:5]))
+
+    return rows
+
+def parse0D(lines):
+    """Converts lines of a time only output file to values
+
+    Args:
+       lines (list(str))  : lines of the output file
+
+    Returns:
+       rows (list(float)) : value of each line
+    """
+    return [float(line.split()[1]) for line in lines]
+
+def followtimekeys(simname):
+    """Brings the datetimes and hour strings of a running simulation up to date
+
+    Args:
+       simname (str)            : ACCESS simulation name
+
+    Returns:
+       dts (list of datetimes)  : datetimes corresponding to simulation output times
+       hrs (list of str)        : strings corresponding to the hour (24-hr clock)
+    """
+    fndt = os.getcwd()+"/"+simname+"/ACCESS_timekey.dat"
+
+    with lock:
+        stamp = filestamp(fndt)
+        tail, lines = taillines(fndt)
+        rows  = tail.setdefault("rows", [])
+        rows.extend(parsetimekeys(lines))
+        dts   = tuple(row[0] for row in rows)
+        hrs   = tuple(row[1] for row in rows)
+        if (filestamp(fndt) == stamp):
+            replacemem(("timekeys", fndt, stamp), (dts, hrs))
+            replacemem(("timekeys64", fndt, stamp), (np.array(dts, dtype="datetime64[s]"), np.array(hrs, dtype="U5")))
+
+    return list(dts), list(hrs)
+
+def follow0Dvar(simname, dirname, varname):
+    """Brings a time only output file of a running simulation up to date
+
+    Only the lines added since the last call are parsed, into the dtype of the
+    readers (see pltutils.setdtype).
+
+    Args:
+       simname (str)         : ACCESS simulation name
+       dirname (str)         : name of the simulation output directory
+       varname (str)         : variable name
+
+    Returns:
+       var (numpy 1D array)  : data corresponding to varname
+    """
+    fnvar = os.getcwd()+"/"+simname+"/"+dirname+"/"+varname+".dat"
+    dtype = getdtype()
+
+    with lock:
+        stamp = filestamp(fnvar)
+        tail  = tails.get(fnvar)
+        tail, lines = taillines(fnvar, tail is not None and tail.get("dtype") != dtype)
+        if ("buf" not in tail):
+            tail.update({"nts": 0, "buf": None, "dtype": dtype})
+
+        n    = tail["nts"]
+        vals = np.array(parse0D(lines), dtype=dtype)
+        if (len(vals) > 0):
+            tail["buf"] = growbuf(tail["buf"], n, n+len(vals), (), dtype)
+            tail["buf"][n:n+len(vals)] = vals
+            tail["nts"] = n+len(vals)
+
+        var = tail["buf"][:tail["nts"]] if (tail["buf"] is not None) else np.zeros(0, dtype=dtype)
+        if (filestamp(fnvar) == stamp):
+            replacemem(("get0Dvar", fnvar, stamp, dtype.name), var)
+
+    return var
+
+def follow1Dvar(simname, dirname, varname):
+    """Brings a height-time output file of a running simulation up to date
+
+    Only the columns (output times) added since the last call are parsed, into
+    the dtype of the readers (see pltutils.setdtype).  If
+    the file cannot be parsed (e.g., it is being rewritten), the data from the
+    last call are returned and the new columns are read on the next call.
+
+    Args:
+       simname (str)        : ACCESS simulation name
+       dirname (str)        : name of the simulation output directory
+       varname (str)        : variable name
+
+    Returns:
+       z (numpy 1D array)   : domain vertical levels (m)
+       var (numpy 2D array) : data corresponding to varname
+    """
+    fnvar = os.getcwd()+"/"+simname+"/"+dirname+"/"+varname+".dat"
+    dtype = getdtype()
+
+    with lock:
+        stamp = filestamp(fnvar)
+        tail  = tails.get(fnvar)
+
+        with open(fnvar) as fhvar:
+            nts = len(fhvar.readline().split()) - 1       # number of time slices
+
+        if (tail is None or nts < tail["nts"] or tail["dtype"] != dtype):
+            tail = {"nts": 0, "z": None, "buf": None, "dtype": dtype}
+        n = tail["nts"]
+
+        if (nts > n):
+            try:
+                with open(fnvar) as fhvar:
+                    fhvar.readline()
+                    cols = [0]+list(range(n+1, nts+1)) if (n == 0) else list(range(n+1, nts+1))
+                    dat  = np.loadtxt(fhvar, usecols=cols, ndmin=2, dtype=dtype)
+                if (n == 0):
+                    tail["z"] = dat[:, 0].copy()          # vertical heights (m)
+                    dat = dat[:, 1:]
+                if (dat.shape[0] != len(tail["z"])):
+                    raise ValueError("Incomplete file")
+
+                buf = growbuf(tail["buf"], n, nts, (dat.shape[0],), dtype)
+                buf[:, n:nts] = dat
+                tail["buf"] = buf
+                tail["nts"] = nts
+            except ValueError:
+                pass
+            tails[fnvar] = tail
+
+        z   = tail["z"]
+        var = tail["buf"][:, :tail["nts"]] if (tail["buf"] is not None) else np.zeros((0, 0), dtype=dtype)
+        if (z is not None and tail["nts"] == nts and filestamp(fnvar) == stamp):
+            replacemem(("get1Dvar", fnvar, stamp, dtype.name), (z, var))
+
+    return z, var
+
+def follow(simname, func, args=(), kwargs=None, vars1d=(), vars0d=(), interval=60., maxpolls=None, verbose=True):
+    """Follows a running simulation and redraws a figure whenever its output grows
+
+    On every poll the followed files are brought up to date, and if any of
+    them changed func(*args, **kwargs) is called, e.g. a plotting function
+    re-saving its image for a live dashboard.
+
+    Args:
+       simname  (str)            : ACCESS simulation name
+       func     (func)           : function drawing the figure, e.g. genvar.plotprofs1
+       args     (tuple)          : positional arguments of func
+       kwargs   (dict)           : keyword arguments of func
+       vars1d   (list of tuple)  : (dirname, varname) of the height-time files used by func
+       vars0d   (list of tuple)  : (dirname, varname) of the time only files used by func
+       interval (float)          : time between polls (s)
+       maxpolls (int)            : stop after this many polls, default is to follow until interrupted
+       verbose  (bool)           : print a line for each redraw
+
+    Returns:
+       nredraws (int)            : number of times func was called
+    """
+    if (kwargs is None):
+        kwargs = {}
+
+    simdir = os.getcwd()+"/"+simname
+    fnames = [simdir+"/ACCESS_timekey.dat"]
+    fnames+= [simdir+"/"+dirname+"/"+varname+".dat" for dirname, varname in vars1d]
+    fnames+= [simdir+"/"+dirname+"/"+varname+".dat" for dirname, varname in vars0d]
+
+    stamps   = {}
+    npolls   = 0
+    nredraws = 0
+    try:
+        while (maxpolls is None or npolls < maxpolls):
+            if (npolls > 0):
+                time.sleep(interval)
+            npolls+=1
+
+            # skip the poll if nothing changed
+            newstamps = {fname: filestamp(fname) for fname in fnames}
+            if (newstamps == stamps):
+                continue
+            stamps = newstamps
+
+            t0 = time.time()
+            dts, hrs = followtimekeys(simname)
+            for dirname, varname in vars1d:
+                follow1Dvar(simname, dirname, varname)
+            for dirname, varname in vars0d:
+                follow0Dvar(simname, dirname, varname)
+            func(*args, **kwargs)
+            nredraws+=1
+
+            if verbose:
+                tlast = datetime.strftime(dts[-1], "%Y-%m-%d %H:%M:%S") if dts else "-"
+                print("%s  %d output times, last %s, redrawn in %.2f s" % (datetime.now().strftime("%H:%M:%S"),
+                      len(dts), tlast, time.time()-t0))
+    except KeyboardInterrupt:
+        pass
+
+    return nredraws
@@ -0,0 +1,195 @@
+#==================================================================================================
+# memcache.py - in-process LRU cache for data read from ACCESS output files
+#
+# Sits in front of the pltutils readers so that repeated reads of the same file
+# within a session return the already loaded (read-only) data.
+#
+import threading
+from collections import OrderedDict
+import numpy as np
+
+maxbytes  = 1024*1024*1024     # memory budget for cached data (bytes), 0 disables the cache
+
+entries   = OrderedDict()      # cached values by key, least recently used first
+sizes     = {}                 # size (bytes) of each cached value
+nbytes    = 0                  # total size of cached values (bytes)
+hits      = 0                  # number of cache hits
+misses    = 0                  # number of cache misses
+evictions = 0                  # number of entries evicted to stay within the budget
+
+lock = threading.RLock()
+
+def setmemcache(budget):
+    """Sets the memory budget of the in-process cache, evicting entries if needed
+
+    Args:
+       budget (int)  : memory budget (bytes), 0 disables the cache
+
+    Returns:
+       Nothing
+    """
+    global maxbytes
+    with lock:
+        maxbytes = budget
+        evict(0)
+
+    return
+
+def memcachestats():
+    """Returns the usage statistics of the in-process cache
+
+    Args:
+       None
+
+    Returns:
+       stats (dict)  : hits, misses, evictions, number of entries, bytes used and budget
+    """
+    with lock:
+        stats = {"hits": hits, "misses": misses, "evictions": evictions,
+                 "entries": len(entries), "nbytes": nbytes, "maxbytes": maxbytes}
+
+    return stats
+
+def clearmemcache():
+    """Empties the in-process cache and resets its statistics
+
+    Args:
+       None
+
+    Returns:
+       Nothing
+    """
+    global nbytes, hits, misses, evictions
+    with lock:
+        entries.clear()
+        sizes.clear()
+        nbytes    = 0
+        hits      = 0
+        misses    = 0
+        evictions = 0
+
+    return
+
+def sizeof(value):
+    """Estimates the memory held by a cached value
+
+    Memory-mapped arrays are backed by the page cache rather than the process
+    heap and are not counted against the budget.
+
+    Args:
+       value (obj)  : array, list or tuple of them, or other object
+
+    Returns:
+       size (int)   : estimated size (bytes)
+    """
+    if isinstance(value, np.memmap):
+        return 0
+    if isinstance(value, np.ndarray):
+        if (value.dtype == object):
+            return value.nbytes + 64*value.size
+        return value.nbytes
+    if isinstance(value, (list, tuple)):
+        return 64*len(value) + sum(sizeof(item) for item in value if not isinstance(item, (str, int, float)))
+
+    return 64
+
+def readonly(value):
+    """Marks the arrays in a value as read-only
+
+    Args:
+       value (obj)  : array, or tuple of arrays and other objects
+
+    Returns:
+       value (obj)  : the same value
+    """
+    if isinstance(value, np.ndarray):
+        value.flags.writeable = False
+    elif isinstance(value, tuple):
+        for item in value:
+            readonly(item)
+
+    return value
+
+def discardmem(key):
+    """Drops a value from the in-process cache, e.g. one superseded by newer data
+
+    Args:
+       key (tuple)  : cache key, including the stamp of the source file
+
+    Returns:
+       Nothing
+    """
+    global nbytes
+    with lock:
+        if key in entries:
+            nbytes-=sizes.pop(key)
+            del entries[key]
+
+    return
+
+def evict(size):
+    """Drops least recently used entries until size more bytes fit in the budget
+
+    Args:
+       size (int)  : number of bytes to make room for
+
+    Returns:
+       Nothing
+    """
+    global nbytes, evictions
+    with lock:
+        while (entries and nbytes+size > maxbytes):
+            key, value = entries.popitem(last=False)
+            nbytes-=sizes.pop(key)
+            evictions+=1
+
+    return
+
+def getmem(key):
+    """Looks up a value in the in-process cache
+
+    Args:
+       key (tuple)  : cache key, including the stamp of the source file
+
+    Returns:
+       value (obj)  : the cached value, or None on a miss
+    """
+    global hits, misses
+    with lock:
+        if key in entries:
+            entries.move_to_end(key)
+            hits+=1
+            return entries[key]
+        misses+=1
+
+    return None
+
+def putmem(key, value):
+    """Stores a value in the in-process cache
+
+    Arrays in the value are made read-only so cached data cannot be modified
+    by accident.  Values larger than the whole budget are not stored.
+
+    Args:
+       key   (tuple) : cache key, including the stamp of the source file
+       value (obj)   : array, or tuple of arrays and other objects
+
+    Returns:
+       value (obj)   : the (now read-only) value
+    """
+    global nbytes
+    readonly(value)
+
+    size = sizeof(value)
+    with lock:
+        if (size > maxbytes):
+            return value
+        if key in entries:
+            nbytes-=sizes.pop(key)
+            del entries[key]
+        evict(size)
+        entries[key] = value
+        sizes[key]   = size
+        nbytes+=size
+
+    return value
@@ -4,14 +4,13 @@
 # Rick D. Saylor, July 2018 (rewrite)
 #
 import os
-from matplotlib import use
-use("WXAgg")
-import matplotlib.pylab as plt
 import numpy as np
-import seaborn as sns
 from datetime import datetime
+from concurrent.futures import ProcessPoolExecutor
 from matplotlib import rcParams
-from .pltutils import pltoutput, timekeys, get1Dvar, setstdfmts
+from .backend import newfig
+from .pltutils import pltoutput, timekeys, getvars, setstdfmts, setstdstyle
+from .canopy import getlai
 
 # colors
 colors = ["gray", "peru", "brown", "red", "royalblue", "green", "violet", "magenta", "cyan", "olive"]
@@ -31,260 +30,261 @@ xtpad = 15     # x title padding
 ytpad = 0      # y title padding
 tlbpad = 0     # tick label padding
 
-def pltall1t(simname, outtype, tslice):
+# profiles shown, as (dirname, varname)
+all1tnames = [("met", "tk"), ("met", "ubar"), ("canopy", "fsun"), ("canopy", "fshd"),
+              ("canopy", "ppfdsun"), ("canopy", "ppfdshd"), ("canopy", "nirsun"),
+              ("canopy", "nirshd"), ("canopy", "lwup"), ("canopy", "lwdn"), ("canopy", "rtsun"),
+              ("canopy", "rtshd"), ("canopy", "rabssun"), ("canopy", "rabsshd"), ("canopy", "rssun"),
+              ("canopy", "rsshd"), ("canopy", "tlsun"), ("canopy", "tlshd"), ("canopy", "gssun"),
+              ("canopy", "gsshd"), ("canopy", "anetsun"), ("canopy", "anetshd")]
+
+# panels, as (name, x-axis title, x title padding, legend font size, legend anchor,
+#             [(profile, color index, marker, legend label), ...])
+all1tpanels = [("lai",  "LAI, m$^2$ m$^{-2}$", xtpad, lfsize, (0.65,0.85),
+                [("lai", 0, "o", "LAI")]),
+               ("frac", "fraction", xtpad-5, lfsize, (0.85,0.75),
+                [("fsun", 1, "o", "f$_{sun}$"), ("fshd", 2, "o", "f$_{shd}$")]),
+               ("lw",   "W m$^{-2}$", xtpad, lfsize, (0.65,0.75),
+                [("lwup", 3, "s", "LW$_{up}$"), ("lwdn", 4, "s", "LW$_{dn}$")]),
+               ("rabs", "W m$^{-2}$", xtpad, lfsize, (0.95,0.75),
+                [("rabssun", 1, "s", "R$_{a,sun}$"), ("rabsshd", 2, "s", "R$_{a,shd}$")]),
+               ("temp", "$^o$C", xtpad, lfsize, (0.55,0.70),
+                [("tlsun", 1, "o", "T$_{l,sun}$"), ("tlshd", 2, "o", "T$_{l,shd}$"), ("tair", 3, "o", "T$_{air}$")]),
+               ("ubar", "m s$^{-1}$", xtpad, lfsize, (0.60,0.80),
+                [("ubar", 0, "o", "u")]),
+               ("gs",   "mol m$^{-2}$ s$^{-1}$", xtpad, lfsize, (0.95,0.75),
+                [("gssun", 1, "o", "g$_{s,sun}$"), ("gsshd", 2, "o", "g$_{s,shd}$")]),
+               ("rs",   "s m$^{-1}$", xtpad, lfsize, (0.95,0.75),
+                [("rssun", 1, "o", "r$_{s,sun}$"), ("rsshd", 2, "o", "r$_{s,shd}$")]),
+               ("anet", "$\mu$mol m$^{-2}$ s$^{-1}$", xtpad, lfsize, (0.95,0.75),
+                [("anetsun", 1, "o", "A$_{n,sun}$"), ("anetshd", 2, "o", "A$_{n,shd}$")]),
+               ("rad",  "W m$^{-2}$", xtpad, lfsize-1, (1.05,0.00),
+                [("ppfdsun", 1, "s", "PPFD$_{sun}$"), ("ppfdshd", 2, "s", "PPFD$_{shd}$"),
+                 ("nirsun", 3, "s", "NIR$_{sun}$"), ("nirshd", 4, "s", "NIR$_{shd}$")])]
+
+def pltall1t(simname, outtype, tslice, tmpl=None, outfn="pall1t"):
    """Create a seven panel figure showing all canopy profiles for
       one time slice of an ACCESS simulation
 
+   A template from newall1t can be passed to draw many time slices on the
+   same figure, which is much faster than building the figure every time.
+
    Args:
       simname  (str)   : ACCESS simulation name
       outtype  (str)   : either 'pdf', 'png', or 'x11'
       tslice   (int)   : time slice from the simulation (t0 = 1)
+      tmpl     (dict)  : figure template from newall1t (optional, 'pdf' or 'png' only)
+      outfn    (str)   : string for output file name
 
    Returns:
-      Nothing
+      fig (obj)        : matplotlib Figure
    """
-   rcParams["mathtext.default"] = "regular"
-
-   dirout = os.getcwd()+"/"
-
    # read elapsed hour/datetime key file
    dts, hrs = timekeys(simname)
-   datetimes = []
-   for dt in dts:
-       datetimes.append(datetime.strftime(dt, "%Y-%m-%d %H:%M:%S")) 
-   
-   # Tair
-   z, atair = get1Dvar(simname, "met", "tk")
-   tair     = atair[:, tslice-1] - 273.15           # convert from K to C
 
-   # Ubar
-   z, aubar = get1Dvar(simname, "met", "ubar")
-   ubar     = aubar[:, tslice-1]*0.01               # cm/s to m/s
+   # read the profiles for this time slice
+   prof = getall1t(simname, tslice)
+
+   # create the plots
+   if (tmpl is None):
+      tmpl = newall1t(outtype)
+   fig = drawall1t(tmpl, prof, simname+" - "+datetime.strftime(dts[tslice], "%Y-%m-%d %H:%M:%S"))
 
-   # fsun
-   z, afsun = get1Dvar(simname, "canopy", "fsun")
-   fsun     = afsun[:, tslice-1]
+   # create output 
+   pltoutput(simname, outfn, outtype, fig)
 
-   # fshd
-   z, afshd = get1Dvar(simname, "canopy", "fshd")
-   fshd     = afshd[:, tslice-1]
+   return fig
 
-   # ppfdsun
-   z, appfdsun = get1Dvar(simname, "canopy", "ppfdsun")
-   ppfdsun     = appfdsun[:, tslice-1]
+def pltall1ts(simname, outtype, tslices, outfn="pall1t", onepdf=False, nworkers=1):
+   """Create the pltall1t figure for many time slices of an ACCESS simulation,
+      reading every file only once
 
-   # ppfdshd
-   z, appfdshd = get1Dvar(simname, "canopy", "ppfdshd")
-   ppfdshd     = appfdshd[:, tslice-1]
+   Each time slice is written to its own file, img/<simname>_<outfn>_<tslice>.<outtype>
+   (tslice zero-padded to 5 digits), or with onepdf to a page of img/<simname>_<outfn>.pdf.
+   The figures are the same as those of pltall1t.
 
-   # nirsun
-   z, anirsun = get1Dvar(simname, "canopy", "nirsun")
-   nirsun     = anirsun[:, tslice-1]
+   Args:
+      simname  (str)       : ACCESS simulation name
+      outtype  (str)       : either 'pdf' or 'png'
+      tslices  (list(int)) : time slices from the simulation (t0 = 1), e.g. range(1, 201)
+      outfn    (str)       : string for output file name
+      onepdf   (bool)      : write all time slices as pages of one pdf file
+      nworkers (int)       : number of worker processes, each rendering a contiguous share of
+                             the time slices (not with onepdf)
 
-   # nirshd
-   z, anirshd = get1Dvar(simname, "canopy", "nirshd")
-   nirshd     = anirshd[:, tslice-1]
+   Returns:
+      status (int)         : 0, or 1 if the output type cannot be written
+   """
+   if (outtype != "pdf" and outtype != "png"):
+      print("Multi-slice pall1t output must be pdf or png!")
+      return 1
+   tslices = list(tslices)
+
+   if (nworkers > 1 and not onepdf and len(tslices) > 1):
+      chunks = [list(chunk) for chunk in np.array_split(tslices, min(nworkers, len(tslices)))]
+      with ProcessPoolExecutor(len(chunks)) as executor:
+         futures = [executor.submit(pltall1ts, simname, outtype, chunk, outfn) for chunk in chunks]
+         return max(future.result() for future in futures)
+
+   # read elapsed hour/datetime key file, and the profiles of all the time slices
+   dts, hrs = timekeys(simname)
+   profs = getall1ts(simname, tslices)
 
-   # lwup
-   z, alwup = get1Dvar(simname, "canopy", "lwup")
-   lwup     = alwup[:, tslice-1]
+   # as drawn by pltall1t once the standard style is set, i.e. after its first call
+   setstdstyle()
+   tmpl = newall1t(outtype)
 
-   # lwdn
-   z, alwdn = get1Dvar(simname, "canopy", "lwdn")
-   lwdn     = alwdn[:, tslice-1]
+   pdf = None
+   if onepdf:
+      from matplotlib.backends.backend_pdf import PdfPages
+      pdf = PdfPages(os.getcwd()+"/img/"+simname+"_"+outfn+".pdf")
 
-   # rtsun
-   z, artsun = get1Dvar(simname, "canopy", "rtsun")
-   rtsun     = artsun[:, tslice-1]
+   try:
+      for tslice, prof in zip(tslices, profs):
+         fig = drawall1t(tmpl, prof, simname+" - "+datetime.strftime(dts[tslice], "%Y-%m-%d %H:%M:%S"))
+         if (pdf is not None):
+            pdf.savefig(fig)
+         else:
+            pltoutput(simname, outfn+"_"+str(tslice).zfill(5), outtype, fig)
+   finally:
+      if (pdf is not None):
+         pdf.close()
 
-   # rtshd
-   z, artshd = get1Dvar(simname, "canopy", "rtshd")
-   rtshd     = artshd[:, tslice-1]
+   return 0
 
-   # rasun
-   z, arasun = get1Dvar(simname, "canopy", "rabssun")
-   rasun     = arasun[:, tslice-1]
+def getall1t(simname, tslice):
+   """Reads all canopy profiles shown by pltall1t for one time slice
 
-   # rashd
-   z, arashd = get1Dvar(simname, "canopy", "rabsshd")
-   rashd     = arashd[:, tslice-1]
+   Args:
+      simname  (str)   : ACCESS simulation name
+      tslice   (int)   : time slice from the simulation (t0 = 1)
 
-   # rssun
-   z, arssun = get1Dvar(simname, "canopy", "rssun")
-   rssun     = arssun[:, tslice-1]
+   Returns:
+      prof (dict)      : profiles by name, with heights "z" and LAI "lai" and "clai"
+   """
+   return getall1ts(simname, [tslice])[0]
 
-   # rsshd
-   z, arsshd = get1Dvar(simname, "canopy", "rsshd")
-   rsshd     = arsshd[:, tslice-1]
+def getall1ts(simname, tslices):
+   """Reads all canopy profiles shown by pltall1t for many time slices,
+      parsing each file once for all of them
 
-   # tlsun
-   z, atlsun = get1Dvar(simname, "canopy", "tlsun")
-   tlsun     = atlsun[:, tslice-1] - 273.15     # convert from K to C
+   Args:
+      simname  (str)       : ACCESS simulation name
+      tslices  (list(int)) : time slices from the simulation (t0 = 1)
 
-   # tlshd
-   z, atlshd = get1Dvar(simname, "canopy", "tlshd")
-   tlshd     = atlshd[:, tslice-1] - 273.15     # convert from K to C
+   Returns:
+      profs (list(dict))   : profiles by name for each time slice, with heights "z" and
+                             LAI "lai" and "clai"
+   """
+   # read the profiles for these time slices, all files at once
+   varsnt = getvars(simname, all1tnames, [tslice-1 for tslice in tslices])
 
-   # gssun
-   z, agssun = get1Dvar(simname, "canopy", "gssun")
-   gssun     = agssun[:, tslice-1]
+   cols = {}
+   for dirname, varname in all1tnames:
+      z, cols[varname] = varsnt[dirname, varname]
 
-   # gsshd
-   z, agsshd = get1Dvar(simname, "canopy", "gsshd")
-   gsshd     = agsshd[:, tslice-1]
+   # Tair
+   cols["tair"] = cols["tk"] - 273.15        # convert from K to C
 
-   # ansun
-   z, aansun = get1Dvar(simname, "canopy", "anetsun")
-   ansun     = aansun[:, tslice-1]
+   # Ubar
+   cols["ubar"] = cols["ubar"]*0.01          # cm/s to m/s
 
-   # anshd
-   z, aanshd = get1Dvar(simname, "canopy", "anetshd")
-   anshd     = aanshd[:, tslice-1]
+   # tlsun, tlshd
+   cols["tlsun"] = cols["tlsun"] - 273.15    # convert from K to C
+   cols["tlshd"] = cols["tlshd"] - 273.15    # convert from K to C
 
    # lai, clai
-   flai = open(dirout+simname+"/canopy/laiprof.dat")
-   lines = flai.readlines()
-   flai.close()
-   lines = lines[1:]   # skip the header line
-   nz = len(z)
-   lai  = np.zeros(nz)
-   clai = np.zeros(nz)
-   k = 0
-   for line in lines:
-      data = line.split()
-      lai[k] = float(data[1])
-      clai[k] = float(data[2])
-      k+=1
+   lai, clai = getlai(simname, len(z))
 
-   # create the plots
-   fig = plt.figure(figsize=(16,12))
+   profs = []
+   for j in range(len(tslices)):
+      prof = {varname: col[:, j] for varname, col in cols.items()}
+      prof["z"]    = z
+      prof["lai"]  = lai
+      prof["clai"] = clai
+      profs.append(prof)
+
+   return profs
+
+def newall1t(outtype):
+   """Creates a reusable figure template for pltall1t
+
+   The axes, labels, grids and legends are built once, with empty lines that
+   drawall1t fills with the profiles of each time slice.
+
+   Args:
+      outtype  (str)   : either 'pdf', 'png', or 'x11'
 
-   # LAI
-   ax = fig.add_subplot(2,5,1)
-   ax.plot(lai, z, color=colors[0], linestyle="None", marker="o", markersize=msize, label="LAI")
+   Returns:
+      tmpl (dict)      : template with the figure "fig", its "axes", and the "lines" by profile name
+   """
+   rcParams["mathtext.default"] = "regular"
 
-   setstdfmts(ax, tlmaj, tlmin, tlbsize, tlbpad)
+   fig = newfig(outtype, (16,12))
+   axes = []
+   lines = {}
 
-   plt.xlabel("LAI, m$^2$ m$^{-2}$", fontsize=xfsize, labelpad=xtpad)
-   plt.legend(loc=4, fontsize=lfsize, bbox_to_anchor=(0.65,0.85))
+   for name, xlabel, xpad, lfs, bbox, profs in all1tpanels:
+      ax = fig.add_subplot(2,5,len(axes)+1)
+      for varname, ic, marker, label in profs:
+         lines[varname], = ax.plot([], [], color=colors[ic], linestyle="None", marker=marker, markersize=msize, label=label)
 
-   # sun/shade fractions
-   ax = fig.add_subplot(2,5,2)
-   ax.plot(fsun, z, color=colors[1], linestyle="None", marker="o", markersize=msize, label="f$_{sun}$")
-   ax.plot(fshd, z, color=colors[2], linestyle="None", marker="o", markersize=msize, label="f$_{shd}$")
+      setstdfmts(ax, tlmaj, tlmin, tlbsize, tlbpad)
 
-   setstdfmts(ax, tlmaj, tlmin, tlbsize, tlbpad)
+      ax.set_xlabel(xlabel, fontsize=xfsize, labelpad=xpad)
+      ax.legend(loc=4, fontsize=lfs, bbox_to_anchor=bbox)
+      axes.append(ax)
 
-   plt.xlabel("fraction", fontsize=xfsize, labelpad=xtpad-5)
-   plt.legend(loc=4, fontsize=lfsize, bbox_to_anchor=(0.85,0.75))
+   return {"fig": fig, "axes": axes, "lines": lines}
 
-   # LW up & dn
-   ax = fig.add_subplot(2,5,3)
-   ax.plot(lwup, z, color=colors[3], linestyle="None", marker="s", markersize=msize, label="LW$_{up}$")
-   ax.plot(lwdn, z, color=colors[4], linestyle="None", marker="s", markersize=msize, label="LW$_{dn}$")
+def drawall1t(tmpl, prof, title):
+   """Draws the profiles of one time slice on a pltall1t figure template
 
-   setstdfmts(ax, tlmaj, tlmin, tlbsize, tlbpad)
+   Only the line data, axis limits and title are changed.
 
-   plt.xlabel("W m$^{-2}$", fontsize=xfsize, labelpad=xtpad)
-   plt.legend(loc=4, fontsize=lfsize, bbox_to_anchor=(0.65,0.75))
+   Args:
+      tmpl     (dict)  : template from newall1t
+      prof     (dict)  : profiles from getall1t
+      title    (str)   : figure title
 
-   # Rabs sun & shade
-   ax = fig.add_subplot(2,5,4)
-   ax.plot(rasun, z, color=colors[1], linestyle="None", marker="s", markersize=msize, label="R$_{a,sun}$")
-   ax.plot(rashd, z, color=colors[2], linestyle="None", marker="s", markersize=msize, label="R$_{a,shd}$")
-   radif = rasun+rashd
-   sumra=0.0
-   nra=0
-   for i in range(nz):
-      if (clai[i] > 0.0):
-         sumra+=0.5*radif[i]
-         nra+=1
+   Returns:
+      fig (obj)        : matplotlib Figure of the template
+   """
+   fig  = tmpl["fig"]
+   axes = tmpl["axes"]
+   z    = prof["z"]
+
+   for varname, line in tmpl["lines"].items():
+      line.set_data(prof[varname], z)
+   for ax in axes:
+      ax.relim()
+      ax.autoscale_view()
+
+   # Rabs sun & shade, centered on the mean in the canopy
+   incan = prof["clai"] > 0.0
+   nra = np.count_nonzero(incan)
    if (nra > 0):
-      ramean = sumra/float(nra)
+      ramean = 0.5*np.sum(prof["rabssun"][incan]+prof["rabsshd"][incan])/nra
    else:
       ramean = 0.0
    drx=0.1*ramean
    drx = max(50.0, drx)
-   plt.xlim(xmax=ramean+drx, xmin=ramean-drx)
-
-   setstdfmts(ax, tlmaj, tlmin, tlbsize, tlbpad)
-
-   plt.xlabel("W m$^{-2}$", fontsize=xfsize, labelpad=xtpad)
-   plt.legend(loc=4, fontsize=lfsize, bbox_to_anchor=(0.95,0.75))
+   axes[3].set_xlim(xmax=ramean+drx, xmin=ramean-drx)
 
    # Tair, Tleaf_sun, Tleaf_shd
-   ax = fig.add_subplot(2,5,5)
-   ax.plot(tlsun, z, color=colors[1], linestyle="None", marker="o", markersize=msize, label="T$_{l,sun}$")
-   ax.plot(tlshd, z, color=colors[2], linestyle="None", marker="o", markersize=msize, label="T$_{l,shd}$")
-   ax.plot(tair, z, color=colors[3], linestyle="None", marker="o", markersize=msize, label="T$_{air}$")
-   tamin = min(tair)
-   tamax = max(tair)
-   tdif = tlsun-tlshd
+   tamin = min(prof["tair"])
+   tamax = max(prof["tair"])
+   tdif = prof["tlsun"]-prof["tlshd"]
    dtx = max(abs(tdif))
    dtx = max(5.0, dtx)
-   plt.xlim(xmax=tamax+dtx, xmin=tamin-dtx)
-
-   setstdfmts(ax, tlmaj, tlmin, tlbsize, tlbpad)
-
-   plt.xlabel("$^o$C", fontsize=xfsize, labelpad=xtpad)
-   plt.legend(loc=4, fontsize=lfsize, bbox_to_anchor=(0.55,0.70))
-
-   # Mean wind speed
-   ax = fig.add_subplot(2,5,6)
-   ax.plot(ubar, z, color=colors[0], linestyle="None", marker="o", markersize=msize, label="u")
-
-   setstdfmts(ax, tlmaj, tlmin, tlbsize, tlbpad)
-
-   plt.xlabel("m s$^{-1}$", fontsize=xfsize, labelpad=xtpad)
-   plt.legend(loc=4, fontsize=lfsize, bbox_to_anchor=(0.60,0.80))
-
-   # Stomatal conductance, sun & shade
-   ax = fig.add_subplot(2,5,7)
-   ax.plot(gssun, z, color=colors[1], linestyle="None", marker="o", markersize=msize, label="g$_{s,sun}$")
-   ax.plot(gsshd, z, color=colors[2], linestyle="None", marker="o", markersize=msize, label="g$_{s,shd}$")
-
-   setstdfmts(ax, tlmaj, tlmin, tlbsize, tlbpad)
-
-   plt.xlabel("mol m$^{-2}$ s$^{-1}$", fontsize=xfsize, labelpad=xtpad)
-   plt.legend(loc=4, fontsize=lfsize, bbox_to_anchor=(0.95,0.75))
+   axes[4].set_xlim(xmax=tamax+dtx, xmin=tamin-dtx)
 
    # Stomatal resistance, sun & shade
-   ax = fig.add_subplot(2,5,8)
-   ax.plot(rssun, z, color=colors[1], linestyle="None", marker="o", markersize=msize, label="r$_{s,sun}$")
-   ax.plot(rsshd, z, color=colors[2], linestyle="None", marker="o", markersize=msize, label="r$_{s,shd}$")
-   xmin, xmax = ax.get_xlim()
-   plt.xticks(np.arange(xmin, xmax+1, 1000.))
-
-   setstdfmts(ax, tlmaj, tlmin, tlbsize, tlbpad)
-
-   plt.xlabel("s m$^{-1}$", fontsize=xfsize, labelpad=xtpad)
-   plt.legend(loc=4, fontsize=lfsize, bbox_to_anchor=(0.95,0.75))
-
-   # Net photosynthetic assimilation rate, sun & shade
-   ax = fig.add_subplot(2,5,9)
-   ax.plot(ansun, z, color=colors[1], linestyle="None", marker="o", markersize=msize, label="A$_{n,sun}$")
-   ax.plot(anshd, z, color=colors[2], linestyle="None", marker="o", markersize=msize, label="A$_{n,shd}$")
+   axes[7].set_autoscalex_on(True)
+   axes[7].autoscale_view()
+   xmin, xmax = axes[7].get_xlim()
+   axes[7].set_xticks(np.arange(xmin, xmax+1, 1000.))
 
-   setstdfmts(ax, tlmaj, tlmin, tlbsize, tlbpad)
-
-   plt.xlabel("$\mu$mol m$^{-2}$ s$^{-1}$", fontsize=xfsize, labelpad=xtpad)
-   plt.legend(loc=4, fontsize=lfsize, bbox_to_anchor=(0.95,0.75))
-
-   # PPFD and NIR, sun & shade
-   ax = fig.add_subplot(2,5,10)
-   ax.plot(ppfdsun, z, color=colors[1], linestyle="None", marker="s", markersize=msize, label="PPFD$_{sun}$")
-   ax.plot(ppfdshd, z, color=colors[2], linestyle="None", marker="s", markersize=msize, label="PPFD$_{shd}$")
-   ax.plot(nirsun, z, color=colors[3], linestyle="None", marker="s", markersize=msize, label="NIR$_{sun}$")
-   ax.plot(nirshd, z, color=colors[4], linestyle="None", marker="s", markersize=msize, label="NIR$_{shd}$")
-
-   setstdfmts(ax, tlmaj, tlmin, tlbsize, tlbpad)
-
-   plt.xlabel("W m$^{-2}$", fontsize=xfsize, labelpad=xtpad)
-   plt.legend(loc=4, fontsize=lfsize-1, bbox_to_anchor=(1.05,0.00))
-
-   plt.suptitle(simname+" - "+datetimes[tslice], fontsize=tfsize, y=tyloc) 
-
-   # create output 
-   pltoutput(simname, "pall1t", outtype)
+   fig.suptitle(title, fontsize=tfsize, y=tyloc)
 
-   return
+   return fig
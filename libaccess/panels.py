@@ -0,0 +1,237 @@
+#==========================================================================================================
+# panels.py - plots vertical profiles of any number of variables as a
+#             figure of panels over defined time intervals of a simulation
+#
+# Each panel is described by a spec dictionary, e.g.
+#
+#    {"dirname": "met", "varname": "tk", "varunits": "K", "vartitle": "Air Temperature",
+#     "ztop": 30.0, "xmax": -1., "hc": 10.0}
+#
+import numpy as np
+from .backend import newfig
+from .pltutils import pltoutput, plotprofiles, plotbands, timekeys, timekeys64, timewindow, getvars, setstdfmts
+from .reduce import reduce1Dvar, diurnal1Dvar
+
+# set colors
+colors = ["gray", "peru", "brown", "red", "royalblue", "green", "violet", "magenta", "cyan", "olive"]
+
+# set common figure formatting parameters
+tfsize   = 18     # plot title font size
+tyloc    = 1.02   # plot title y location
+lfsize   = 14     # legend font size
+yfsize   = 18     # y-axis title font size
+ylabpad  = 10     # y-axis title padding
+xfsize   = 18     # x-axis title font size
+xlabpad  = 10     # x-axis title padding
+tlmaj    =  6     # major tick length
+tlmin    =  4     # minor tick length
+tlbsize  = 17     # tick label font size
+tlbpad   =  3     # tick label padding
+lnwdth   = 1.5    # linewidth
+
+###########################################################################################################
+# fmtpanel - set limits, labels and formatting of one profile panel
+#
+def fmtpanel(ax, spec, z, ylabel):
+    """Sets the limits, labels, title and standard formatting of a profile panel
+
+    Args:
+       ax     (obj)   : axes of the panel, with its profiles already drawn
+       spec   (dict)  : variable spec of the panel (see plotpanels)
+       z      (array) : heights (m)
+       ylabel (bool)  : label the height axis
+
+    Returns:
+       Nothing
+    """
+    # limit to specified height
+    ztop = spec.get("ztop", -1.)
+    if (ztop == -1.):
+        ztop = z[len(z)-1]
+    ax.set_ylim(-0.1, ztop)
+    if (spec.get("xmax", -1.) != -1.):
+        ax.set_xlim(-0.1, spec["xmax"])
+
+    # draw line showing canopy height, if applicable
+    hc = spec.get("hc")
+    if (hc is not None and ztop > hc):
+        ahc = [hc, hc]
+        xbnds = list(ax.get_xlim())
+        ax.plot(xbnds, ahc, color='0.25', linestyle='--', linewidth=lnwdth)
+        ax.set_xlim(xbnds[0], xbnds[1])
+
+    # set labels and title
+    ax.set_xlabel(spec.get("varunits", ""), fontsize=xfsize, labelpad=xlabpad)
+    if ylabel:
+        ax.set_ylabel("z (m)", fontsize=yfsize, labelpad=ylabpad)
+    ax.set_title(spec.get("vartitle", spec.get("varname", "")), fontsize=tfsize, y=tyloc)
+
+    # set standard formatting
+    setstdfmts(ax, tlmaj, tlmin, tlbsize, tlbpad)
+
+    return
+
+###########################################################################################################
+# seldata - select the plotted times from the data of a panel
+#
+def seldata(simname, spec, tsel, tstart=None, tend=None):
+    """Selects the plotted times from the data of a panel with "data" in its spec
+
+    The data have a column for each output time of the simulation, like those
+    read by get1Dvar, so the same time window and selection are applied to them
+    as to the variables read for the other panels.
+
+    Args:
+       simname (str)             : ACCESS simulation name
+       spec    (dict)            : variable spec of the panel (see plotpanels)
+       tsel    (slice)           : time slices to plot within the window
+       tstart  (datetime or str) : start of a time window (optional)
+       tend    (datetime or str) : end of a time window (optional)
+
+    Returns:
+       z (numpy 1D array)        : domain vertical levels (m)
+       var (numpy 2D array)      : data at the plotted times
+    """
+    z, var = spec["data"]
+    nts = len(timekeys64(simname)[0])
+    if (np.ndim(var) != 2 or np.shape(var)[1] != nts):
+        raise ValueError("Data for panel "+spec.get("vartitle", spec.get("varname", ""))+" have shape "+
+                         str(np.shape(var))+", not one column for each of the "+str(nts)+" output times")
+
+    return z, var[:, timewindow(simname, tstart, tend)][:, tsel]
+
+###########################################################################################################
+# getstats - reduce the variable of a panel to statistics over time
+#
+def getstats(simname, spec, tstart=None, tend=None):
+    """Computes the statistic profiles drawn by a panel with "stats" in its spec
+
+    Args:
+       simname (str)             : ACCESS simulation name
+       spec    (dict)            : variable spec of the panel (see plotpanels)
+       tstart  (datetime or str) : start of a time window (optional)
+       tend    (datetime or str) : end of a time window (optional)
+
+    Returns:
+       z (numpy 1D array)        : domain vertical levels (m)
+       var (numpy 2D array)      : one profile per column
+       labels (list(str))        : legend label of each profile
+    """
+    stats = spec["stats"]
+    freq  = spec.get("freq")
+    z, red, glabels = reduce1Dvar(simname, spec["dirname"], spec["varname"], stats, freq, spec.get("hours"),
+                                  tstart, tend)
+
+    if (freq is None):
+        return z, np.column_stack([red[stat] for stat in stats]), list(stats)
+
+    labels = []
+    for stat in stats:
+        labels+= glabels if (len(stats) == 1) else [stat+" "+glabel for glabel in glabels]
+
+    return z, np.concatenate([red[stat] for stat in stats], axis=1), labels
+
+###########################################################################################################
+# plotpanels - create a figure of vertical profile panels, one for each variable spec
+#
+def plotpanels(simname, specs, outtype, outfn, intdt, layout=None, figsize=None, suptitle=None, supy=0.97,
+               legbbox=(0.99, 0.10), tstart=None, tend=None):
+    """Create a vertical profile figure with one panel for each variable spec
+
+    Each spec is a dictionary with the keys
+       dirname  (str)   : simulation output directory
+       varname  (str)   : name of variable plotted
+       varunits (str)   : units string for x-axis label
+       vartitle (str)   : panel title
+       ztop     (float) : height of the top of the panel (m), -1. for the top of the domain (optional)
+       xmax     (float) : maximum value on x-axis, -1. for automatic (optional)
+       hc       (float) : canopy height (m), drawn as a line if below ztop (optional)
+       data     (tuple) : (z, var) already in hand, instead of reading dirname/varname, with a column
+                          of var for each output time of the simulation, e.g. from get1Dvar (optional)
+       stats    (list)  : statistics over time to draw instead of the profiles at each intdt time,
+                          e.g. ["min", "mean", "max"] or ["p90"] (optional, see reduce.reduce1Dvar)
+       freq     (str)   : with stats, "hourly", "daily" or "diurnal" to draw a profile for each group
+       hours    (tuple) : with stats, (first, last) hour of the day to include, e.g. (6, 18)
+       diurnal  (bool)  : draw the diurnal composite (mean over all days) for each hour of the day
+                          instead of the profiles at each intdt time (optional, see reduce.diurnal1Dvar)
+       spread   (bool)  : with diurnal, shade one standard deviation about each composite profile
+
+    Variables used by more than one panel are read only once, and all are read
+    concurrently.
+
+    Args:
+       simname  (str)        : ACCESS simulation name
+       specs    (list(dict)) : variable specs, one per panel
+       outtype  (str)        : either 'pdf', 'png', or 'x11'
+       outfn    (str)        : string for output file name
+       intdt    (int)        : time step interval for plotting profiles
+       layout   (tuple)      : (nrows, ncols) of panels, default is one row
+       figsize  (tuple)      : figure (width, height) in inches, default is 4+4*ncols by 10*nrows
+       suptitle (str)        : figure title above the panels (optional)
+       supy     (float)      : figure title y location
+       legbbox  (tuple)      : legend anchor in the last panel
+       tstart   (datetime)   : start of a time window to plot, or "YYYY-MM-DD HH:MM:SS" (optional)
+       tend     (datetime)   : end of a time window to plot (optional)
+
+    Returns:
+       fig (obj)             : matplotlib Figure
+    """
+    # read elapsed hour/datetime key file
+    dts, hrs = timekeys(simname, tstart, tend)
+    labels = hrs[::intdt]
+
+    # get data for all distinct vars at once
+    names = []
+    for spec in specs:
+        if ("data" in spec or "stats" in spec or spec.get("diurnal")):
+            continue
+        if ((spec["dirname"], spec["varname"]) not in names):
+            names.append((spec["dirname"], spec["varname"]))
+    pvars = getvars(simname, names, slice(0, None, intdt), tstart, tend)
+
+    # create the plot
+    if (layout is None):
+        layout = (1, len(specs))
+    nrows, ncols = layout
+    if (figsize is None):
+        figsize = (4+4*ncols, 10*nrows)
+    fig = newfig(outtype, figsize)
+
+    for i, spec in enumerate(specs):
+        plabels = labels
+        spread  = None
+        if ("data" in spec):
+            z, var = seldata(simname, spec, slice(0, None, intdt), tstart, tend)
+        elif ("stats" in spec):
+            z, var, plabels = getstats(simname, spec, tstart, tend)
+        elif (spec.get("diurnal")):
+            z, var, std, hours = diurnal1Dvar(simname, spec["dirname"], spec["varname"], tstart, tend)
+            plabels = ["%02d:00" % hour for hour in hours]
+            if (spec.get("spread")):
+                spread = std
+        else:
+            z, var = pvars[spec["dirname"], spec["varname"]]
+
+        ax = fig.add_subplot(nrows, ncols, i+1)
+
+        # shade the spread about each composite profile, under the profiles
+        if (spread is not None):
+            plotbands(ax, var-spread, var+spread, z, colors)
+
+        # plot one line for each time with intdt interval (or each statistic or hour)
+        plotprofiles(ax, var, z, plabels, colors, lnwdth)
+
+        # set limits, labels (height only on the first column), title and formatting
+        fmtpanel(ax, spec, z, i % ncols == 0)
+
+    # add the legend (only on the last panel)
+    ax.legend(loc=4, fontsize=lfsize, bbox_to_anchor=legbbox)
+
+    # add super title
+    if (suptitle is not None):
+        fig.suptitle(suptitle, fontsize=tfsize, x=0.5, y=supy)
+
+    # create output
+    pltoutput(simname, outfn, outtype, fig)
+
+    return fig
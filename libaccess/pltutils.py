@@ -4,12 +4,192 @@
 # Rick D. Saylor, July 2018
 #
 import os
-from matplotlib import use
-use("WXAgg")
-import matplotlib.pylab as plt
+import sys
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
 import numpy as np
-import seaborn as sns
 from datetime import datetime
+from .backend import getplt
+from . import datacache
+from .datacache import loadcache, savecache, filestamp, cachename
+from .memcache import getmem, putmem, readonly
+
+profmode  = "lines"    # how profiles are drawn: "lines", "collection", or "auto"
+maxlines  = 48         # most profiles drawn as separate lines in "auto" mode
+maxlegend = 24         # most legend entries for profiles drawn as a collection
+vardtype  = "float64"  # dtype of the arrays returned by the readers
+
+# trapezoidal rule integration, named trapz before numpy 2.0
+trapezoid = getattr(np, "trapezoid", None) or np.trapz
+
+def setprofmode(mode):
+    """Sets how the profile plots draw their vertical profiles
+
+    In "lines" mode each profile is a separate line with its own legend entry.
+    In "collection" mode all profiles of a panel are drawn as one
+    LineCollection, so draw and save times barely grow with the number of
+    profiles.  "auto" uses lines for up to maxlines profiles and a collection
+    beyond that.  The default is "lines", as the figures have always been drawn.
+
+    Args:
+       mode (str)  : either "lines", "collection", or "auto"
+
+    Returns:
+       Nothing
+    """
+    global profmode
+    if (mode not in ("lines", "collection", "auto")):
+        raise ValueError("Unknown profile mode: "+str(mode))
+    profmode = mode
+
+    return
+
+def setdtype(dtype):
+    """Sets the dtype the readers parse output files into
+
+    "float32" halves the memory held by loaded variables (and their cache
+    entries), which is ample precision for plotting.  Data are parsed straight
+    into the dtype, and each dtype has its own in-process and disk cache entries.
+
+    Args:
+       dtype (str)  : numpy float dtype, e.g. "float32" or "float64"
+
+    Returns:
+       Nothing
+    """
+    global vardtype
+    if (np.dtype(dtype).kind != "f"):
+        raise ValueError("Not a float dtype: "+str(dtype))
+    vardtype = np.dtype(dtype).name
+
+    return
+
+def getdtype(dtype=None):
+    """Returns the dtype to read into, the global one unless given
+
+    Args:
+       dtype (str)    : numpy float dtype (optional)
+
+    Returns:
+       dtype (dtype)  : numpy dtype
+    """
+    return np.dtype(vardtype if (dtype is None) else dtype)
+
+def loadentry(simname, dirname, varname, fnvar, keys, dtype):
+    """Memory-maps the current cache entry of an output file parsed as dtype
+
+    If there is no entry for dtype and the source file no longer exists (e.g.,
+    a store converted as float64 only), the float64 entry is converted.
+
+    Args:
+       simname (str)        : ACCESS simulation name
+       dirname (str)        : name of the simulation output directory
+       varname (str)        : variable name
+       fnvar   (str)        : path of the source .dat file
+       keys    (list(str))  : names of the arrays stored for this entry
+       dtype   (dtype)      : numpy float dtype of the data
+
+    Returns:
+       arrays (dict)        : arrays by key, or None
+    """
+    cached = loadcache(simname, dirname, cachename(varname, dtype), fnvar, keys)
+    if (cached is not None or dtype == np.float64 or os.path.exists(fnvar)):
+        return cached
+
+    cached = loadcache(simname, dirname, varname, fnvar, keys)
+    if (cached is not None):
+        cached = {key: arr.astype(dtype) for key, arr in cached.items()}
+
+    return cached
+
+def plotprofiles(ax, var, z, labels, colors, lnwdth):
+    """Draws one vertical profile for each time column of a variable
+
+    Profile colors cycle through colors.  When the profiles are drawn as a
+    collection, the legend is limited to about maxlegend entries by labeling
+    only every n-th profile.
+
+    Args:
+       ax     (obj)       : axes to draw on
+       var    (array)     : variable values, shape (nz, ntimes)
+       z      (array)     : heights (m), shape (nz)
+       labels (list(str)) : legend label for each time column
+       colors (list(str)) : line colors, cycled over the profiles
+       lnwdth (float)     : linewidth
+
+    Returns:
+       Nothing
+    """
+    nprof = var.shape[1]
+
+    mode = profmode
+    if (mode == "auto"):
+        mode = "lines" if nprof <= maxlines else "collection"
+
+    if (mode == "lines"):
+        ic = 0                    # color array index
+        for j in range(nprof):
+            ax.plot(var[:, j], z, color=colors[ic], linestyle="-", linewidth=lnwdth, label=labels[j])
+            ic+=1
+            if (ic > len(colors)-1):    # cycle back through the colors
+                ic = 0
+        return
+
+    from matplotlib.collections import LineCollection
+
+    # all profiles as one artist, segments of shape (nprof, nz, 2)
+    segs = np.empty((nprof, len(z), 2))
+    segs[:, :, 0] = np.asarray(var).T
+    segs[:, :, 1] = z
+    pcolors = [colors[j % len(colors)] for j in range(nprof)]
+    ax.add_collection(LineCollection(segs, colors=pcolors, linestyles="-", linewidths=lnwdth), autolim=True)
+    ax.autoscale_view()
+
+    # empty lines as legend entries for every n-th profile
+    nstep = -(-nprof//maxlegend)
+    for j in range(0, nprof, nstep):
+        ax.plot([], [], color=pcolors[j], linestyle="-", linewidth=lnwdth, label=labels[j])
+
+    return
+
+def plotbands(ax, lo, hi, z, colors, alpha=0.15):
+    """Shades the spread of each vertical profile between a lower and upper bound
+
+    Band colors cycle through colors, matching the profiles of plotprofiles.
+
+    Args:
+       ax     (obj)       : axes to draw on
+       lo     (array)     : lower bound of each profile, shape (nz, nprofiles)
+       hi     (array)     : upper bound of each profile, shape (nz, nprofiles)
+       z      (array)     : heights (m), shape (nz)
+       colors (list(str)) : band colors, cycled over the profiles
+       alpha  (float)     : band opacity
+
+    Returns:
+       Nothing
+    """
+    for j in range(lo.shape[1]):
+        ax.fill_betweenx(z, lo[:, j], hi[:, j], color=colors[j % len(colors)], alpha=alpha, linewidth=0)
+
+    return
+
+def setstdstyle():
+    """Sets the seaborn context and style used by the standard formatting
+
+    setstdfmts applies it when formatting each plot, after the axes have been
+    created; setting it first makes the first figure of a session look like
+    the following ones.
+
+    Args:
+       None
+
+    Returns:
+       Nothing
+    """
+    import seaborn as sns
+    sns.set_context("talk")
+    sns.set_style("ticks")
+
+    return
 
 def setstdfmts(ax, tlmaj, tlmin, tlbsize, tlbpad):
     """Set standard formatting for plots
@@ -28,15 +208,14 @@ def setstdfmts(ax, tlmaj, tlmin, tlbsize, tlbpad):
 
     """
     # seaborn settings
-    sns.set_context("talk")
-    sns.set_style("ticks")
+    setstdstyle()
 
     # pretty grid
-    plt.grid(b=True, which="major", color="gray", linewidth=1.0, alpha=0.50)
-    plt.grid(b=True, which="minor", color="gray", linewidth=0.5, alpha=0.25)
+    ax.grid(True, which="major", color="gray", linewidth=1.0, alpha=0.50)
+    ax.grid(True, which="minor", color="gray", linewidth=0.5, alpha=0.25)
 
     # pretty ticks
-    plt.minorticks_on()
+    ax.minorticks_on()
     ax.tick_params(which="both", direction="out")
     ax.tick_params(which="major", length=tlmaj)
     ax.tick_params(which="minor", length=tlmin)
@@ -44,58 +223,176 @@ def setstdfmts(ax, tlmaj, tlmin, tlbsize, tlbpad):
 
     return
 
-def pltoutput(simname, varname, outtype):
+def pltoutput(simname, varname, outtype, fig=None):
     """Output the figure to the screen or to a file, as specified
 
+    The figure is closed once it has been written, so repeated plotting does
+    not accumulate open figures.
+
     Args:
        simname (str)  : ACCESS simulation name
        varname (str)  : name of variable plotted
        outtype (str)  : either 'pdf', 'png', or 'x11'
+       fig     (obj)  : matplotlib Figure to output, default is the current pyplot figure
 
     Returns:
        Nothing
     """
+    if (fig is None):
+        fig = getplt(outtype).gcf()
+
     # output file name for hardcopy
     ofname = os.getcwd()+"/img/"+simname+"_"+varname
 
     if   (outtype == "pdf"):
-        plt.savefig(ofname+".pdf")
+        fig.savefig(ofname+".pdf")
 
     elif (outtype == "png"):
-        plt.savefig(ofname+".png")
+        fig.savefig(ofname+".png")
 
     else:
-        plt.show()
+        getplt(outtype).show()
+
+    # release the figure if pyplot manages it
+    if ("matplotlib.pyplot" in sys.modules):
+        sys.modules["matplotlib.pyplot"].close(fig)
 
     return
 
-def timekeys(simname):
+def todatetime(dt):
+    """Converts a datetime specification to a datetime
+
+    Args:
+       dt (datetime or str)  : datetime, or string formatted as "YYYY-MM-DD HH:MM:SS",
+                               "YYYY-MM-DD HH:MM" or "YYYY-MM-DD"
+
+    Returns:
+       dt (datetime)         : the corresponding datetime
+    """
+    if isinstance(dt, datetime):
+        return dt
+
+    for fmt in ["%Y-%m-%d %H:%M:%S", "%Y-%m-%d %H:%M", "%Y-%m-%d"]:
+        try:
+            return datetime.strptime(dt, fmt)
+        except ValueError:
+            pass
+
+    raise ValueError("Unknown datetime format: "+dt)
+
+def timewindow(simname, tstart=None, tend=None):
+    """Finds the simulation output times within a datetime window
+
+    Args:
+       simname (str)             : ACCESS simulation name
+       tstart  (datetime or str) : start of the window (inclusive), default is the first output time
+       tend    (datetime or str) : end of the window (inclusive), default is the last output time
+
+    Returns:
+       tw (slice)                : time slice indices (t0 = 0) of the output times in the window
+    """
+    dts, hrs = timekeys64(simname)
+
+    i0 = 0
+    i1 = len(dts)
+    if (tstart is not None):
+        i0 = int(np.searchsorted(dts, np.datetime64(todatetime(tstart)), "left"))
+    if (tend is not None):
+        i1 = int(np.searchsorted(dts, np.datetime64(todatetime(tend)), "right"))
+
+    return slice(i0, max(i0, i1))
+
+def windowsel(simname, tstart, tend, tsel=None):
+    """Combines a datetime window with a time slice selection relative to it
+
+    Args:
+       simname (str)             : ACCESS simulation name
+       tstart  (datetime or str) : start of the window (inclusive)
+       tend    (datetime or str) : end of the window (inclusive)
+       tsel    (int, slice, or list of int) : time slice(s) within the window, default is all
+
+    Returns:
+       tsel (slice, int, or numpy array) : time slice(s) relative to the start of the simulation
+    """
+    tw = timewindow(simname, tstart, tend)
+    if (tsel is None):
+        return tw
+
+    return np.arange(tw.start, tw.stop)[tsel]
+
+def timekeys64(simname, tstart=None, tend=None):
+    """Reads timekey file from ACCESS simulation and returns datetimes
+       and hour strings as numpy arrays
+
+    The whole file is converted at once, and the result is kept in the
+    in-process cache, so repeated calls in a session cost nothing.
+
+    Args:
+       simname (str)             : ACCESS simulation name
+       tstart  (datetime or str) : start of a time window (optional)
+       tend    (datetime or str) : end of a time window (optional)
+
+    Returns:
+       dts (numpy datetime64 array) : datetimes corresponding to simulation output times
+       hrs (numpy str array)        : strings corresponding to the hour (24-hr clock)
+    """
+    if (tstart is not None or tend is not None):
+        dts, hrs = timekeys64(simname)
+        tw = timewindow(simname, tstart, tend)
+        return dts[tw], hrs[tw]
+
+    # read elapsed hour/datetime key file
+    fndt = os.getcwd()+"/"+simname+"/ACCESS_timekey.dat"
+
+    key = ("timekeys64", fndt, filestamp(fndt))
+    cached = getmem(key)
+    if (cached is not None):
+        return cached
+
+    with open(fndt) as fhdt:
+        fhdt.readline()            # ignore the header line
+        first = fhdt.readline()
+        ncols = len(first.split())
+        if (ncols == 0):
+            return putmem(key, (np.zeros(0, dtype="datetime64[s]"), np.zeros(0, dtype="U5")))
+        data  = np.array((first+fhdt.read()).split()).reshape(-1, ncols)
+
+    dts = np.char.add(np.char.add(data[:, 1], "T"), data[:, 2]).astype("datetime64[s]")
+    hrs = data[:, 2].astype("U5")
+
+    return putmem(key, (dts, hrs))
+
+def timekeys(simname, tstart=None, tend=None):
     """Reads timekey file from ACCESS simulation and returns datetimes
        and hour strings
 
     Args:
        simname (str)            : ACCESS simulation name
+       tstart  (datetime or str) : start of a time window (optional)
+       tend    (datetime or str) : end of a time window (optional)
 
     Returns:
        dts (list of datetimes)  : datetimes corresponding to simulation output times
        hrs (list of str)        : strings corresponding to the hour (24-hr clock)
     """
+    if (tstart is not None or tend is not None):
+        dts, hrs = timekeys(simname)
+        tw = timewindow(simname, tstart, tend)
+        return dts[tw], hrs[tw]
+
     # read elapsed hour/datetime key file
     fndt = os.getcwd()+"/"+simname+"/ACCESS_timekey.dat"
-    fhdt = open(fndt)
-    lines = fhdt.readlines()
-    fhdt.close()
-    lines = lines[1:]          # ignore the header line
 
-    dts = []
-    hrs = []
-    for line in lines:
-        data = line.split()
-        date = data[1]
-        time = data[2]
-        dt   = date+" "+time
-        dts.append(datetime.strptime(dt, "%Y-%m-%d %H:%M:%S"))
-        hrs.append(time[0:5])
+    key = ("timekeys", fndt, filestamp(fndt))
+    cached = getmem(key)
+    if (cached is not None):
+        return list(cached[0]), list(cached[1])
+
+    dts64, hrs64 = timekeys64(simname)
+    dts = dts64.tolist()
+    hrs = hrs64.tolist()
+
+    putmem(key, (tuple(dts), tuple(hrs)))
 
     return dts, hrs
 
@@ -110,6 +407,12 @@ def getspunits(simname):
     """
     # read species units key file
     fnsp = os.getcwd()+"/"+simname+"/ACCESS_ppbv.dat"
+
+    key = ("getspunits", fnsp, filestamp(fnsp))
+    cached = getmem(key)
+    if (cached is not None):
+        return list(cached)
+
     fhsp = open(fnsp)
     lines = fhsp.readlines()
     fhsp.close()
@@ -120,9 +423,37 @@ def getspunits(simname):
         data = line.split()
         ppbvs.append(data[1])
 
+    putmem(key, tuple(ppbvs))
+
     return ppbvs
 
-def get1Dvar(simname, dirname, varname):
+def loaddat(fnvar, usecols=None, skiprows=0, max_rows=None, dtype=float):
+    """Bulk parses an ACCESS .dat output file in a single vectorized pass
+
+    Every line after the header is converted at once by numpy's compiled
+    text parser rather than one float() call per value.
+
+    Args:
+       fnvar   (str)          : full path to the .dat file
+       usecols (list of int)  : columns to parse, default is the number of
+                                columns defined by the header line
+       skiprows (int)         : number of lines after the header to skip
+       max_rows (int)         : maximum number of lines to parse, default is all
+       dtype   (dtype)        : numpy float dtype the values are parsed into
+
+    Returns:
+       dat (numpy 2D array)   : file contents, one row per line after the header
+    """
+    with open(fnvar) as fhvar:
+        header = fhvar.readline()
+        if (usecols is None):
+            usecols = range(len(header.split()))
+        dat = np.loadtxt(fhvar, usecols=usecols, skiprows=skiprows, max_rows=max_rows, ndmin=2,
+                         dtype=dtype)
+
+    return dat
+
+def get1Dvar(simname, dirname, varname, tsel=None, tstart=None, tend=None, dtype=None):
     """Reads a height-time output file from an ACCESS simulation and
        returns the data
 
@@ -130,37 +461,71 @@ def get1Dvar(simname, dirname, varname):
        simname (str)        : ACCESS simulation name
        dirname (str)        : name of the simulation output directory
        varname (str)        : variable name
+       tsel    (int, slice, or list of int) : time slice(s) to read (t0 = 0),
+                              default is all; if the disk cache can be written the whole
+                              file is parsed and cached on the first read, so later reads
+                              cost a memory-map, otherwise only those columns are parsed
+       tstart  (datetime or str) : start of a time window, tsel is then relative to it (optional)
+       tend    (datetime or str) : end of a time window (optional)
+       dtype   (str)        : numpy float dtype to parse into, default is the global one (see setdtype)
 
     Returns:
        z (numpy 1D array)   : domain vertical levels (m)
-       var (numpy 2D array) : data corresponding to varname
+       var (numpy 2D array) : data corresponding to varname (1D if tsel is an int)
     """ 
     fnvar = os.getcwd()+"/"+simname+"/"+dirname+"/"+varname+".dat"
-    fhvar = open(fnvar)
-    lines = fhvar.readlines()
-    fhvar.close()
+    dtype = getdtype(dtype)
 
-    nts   = len(lines[0].split()) - 1    # number of time slices   
-    lines = lines[1:]                    # ignore the header line
-    nz    = len(lines)                   # number of vertical heights
+    # resolve a datetime window to time slices
+    if (tstart is not None or tend is not None):
+        tsel = windowsel(simname, tstart, tend, tsel)
 
-    z   = np.zeros(nz)                   # vertical heights (m)
-    var = np.zeros( (nz, nts) )          # the data
+    # use data already loaded in this session or current in the binary cache
+    key  = ("get1Dvar", fnvar, filestamp(fnvar), dtype.name)
+    full = getmem(key)
+    if (full is None):
+        cached = loadentry(simname, dirname, varname, fnvar, ["z", "var"], dtype)
+        if (cached is not None):
+            full = putmem(key, (cached["z"], cached["var"].T))
 
-    k = 0
-    for line in lines:
-        data = line.split()
-        z[k] = float(data[0])            # vertical height for this line
-        m = 0
-        data = data[1:]                  # now, only the data
-        for value in data:
-            var[k, m] = float(value)     # get data for each time
-            m+=1
-        k+=1 
+    # with a writable disk cache, parse the whole file once so later reads are memory-maps
+    if (full is None and (tsel is None or datacache.canwrite(simname, dirname))):
+        dat = loaddat(fnvar, dtype=dtype)
+
+        z   = dat[:, 0].copy()                        # vertical heights (m)
+        var = np.ascontiguousarray(dat[:, 1:])        # the data, one column per time slice
+
+        # stored time-major, so the data for one output time is contiguous on disk
+        savecache(simname, dirname, cachename(varname, dtype), fnvar, {"z": z, "var": np.ascontiguousarray(var.T)})
+
+        full = putmem(key, (z, var))
+
+    if (full is not None):
+        z, var = full
+        if (tsel is None):
+            return z, var
+        return z, readonly(var[:, tsel])
 
-    return z, var
+    # otherwise (disk cache off or read-only) parse only the selected time slices
+    with open(fnvar) as fhvar:
+        nts = len(fhvar.readline().split()) - 1       # number of time slices
 
-def get0Dvar(simname, dirname, varname):
+    cols = np.arange(nts)[tsel]
+    skey = key+(cols.ndim, tuple(cols.flat))
+    cached = getmem(skey)
+    if (cached is not None):
+        return cached
+
+    dat = loaddat(fnvar, usecols=[0]+list(np.atleast_1d(cols)+1), dtype=dtype)
+
+    z   = dat[:, 0].copy()                            # vertical heights (m)
+    var = np.ascontiguousarray(dat[:, 1:])            # the data for the selected time slices
+    if (cols.ndim == 0):
+        var = var[:, 0]
+
+    return putmem(skey, (z, var))
+
+def get0Dvar(simname, dirname, varname, tstart=None, tend=None, dtype=None):
     """Reads a time only output file from an ACCESS simulation and
        returns the data
 
@@ -168,24 +533,95 @@ def get0Dvar(simname, dirname, varname):
        simname (str)         : ACCESS simulation name
        dirname (str)         : name of the simulation output directory
        varname (str)         : variable name
+       tstart  (datetime or str) : start of a time window, only those rows are parsed (optional)
+       tend    (datetime or str) : end of a time window (optional)
+       dtype   (str)         : numpy float dtype to parse into, default is the global one (see setdtype)
 
     Returns:
        var (numpy 1D array)  : data corresponding to varname
     """
     fnvar = os.getcwd()+"/"+simname+"/"+dirname+"/"+varname+".dat"
-    fhvar = open(fnvar)
-    lines = fhvar.readlines()
-    fhvar.close()
+    dtype = getdtype(dtype)
 
-    lines = lines[1:]                    # ignore the header line
-    nts   = len(lines)                   # number of time slices
-    var = np.zeros(nts)                  # the data
+    # use data already loaded in this session or current in the binary cache
+    key  = ("get0Dvar", fnvar, filestamp(fnvar), dtype.name)
+    full = getmem(key)
+    if (full is None):
+        cached = loadentry(simname, dirname, varname, fnvar, ["var"], dtype)
+        if (cached is not None):
+            full = putmem(key, cached["var"])
 
-    i = 0
-    for line in lines:
-        data = line.split()
-        var[i] = float(data[1])          # get data for each time
-        i+=1 
+    tw = None
+    if (tstart is not None or tend is not None):
+        tw = timewindow(simname, tstart, tend)
+
+    if (full is not None):
+        if (tw is None):
+            return full
+        return full[tw]
+
+    if (tw is None):
+        dat = loaddat(fnvar, usecols=[1], dtype=dtype)
+
+        var = dat[:, 0].copy()                    # the data, one row per time slice
+
+        savecache(simname, dirname, cachename(varname, dtype), fnvar, {"var": var})
+
+        return putmem(key, var)
+
+    # otherwise parse only the rows in the time window
+    wkey = key+(tw.start, tw.stop)
+    cached = getmem(wkey)
+    if (cached is not None):
+        return cached
+    if (tw.stop == tw.start):
+        return putmem(wkey, np.zeros(0, dtype=dtype))
+
+    dat = loaddat(fnvar, usecols=[1], skiprows=tw.start, max_rows=tw.stop-tw.start, dtype=dtype)
+
+    var = dat[:, 0].copy()                        # the data for the time slices in the window
+
+    return putmem(wkey, var)
+
+def getvars(simname, varlist, tsel=None, tstart=None, tend=None, ndim=1, nworkers=None, pool="thread",
+            dtype=None):
+    """Reads many output files from an ACCESS simulation concurrently
+
+    Open/read latency of the individual files (e.g., on a network filesystem)
+    overlaps instead of adding up, as it does when reading the files in turn.
+
+    Args:
+       simname  (str)            : ACCESS simulation name
+       varlist  (list of tuple)  : (dirname, varname) pairs to read
+       tsel     (int, slice, or list of int) : time slice(s) to read from height-time files (optional)
+       tstart   (datetime or str) : start of a time window (optional)
+       tend     (datetime or str) : end of a time window (optional)
+       ndim     (int)            : 1 for height-time files (get1Dvar), 0 for time only files (get0Dvar)
+       nworkers (int)            : number of concurrent readers, default is the pool default
+       pool     (str)            : either 'thread' or 'process'
+       dtype    (str)            : numpy float dtype to parse into, default is the global one (see setdtype)
+
+    Returns:
+       vars (dict)               : data by (dirname, varname), as returned by get1Dvar or get0Dvar
+    """
+    # resolved here, so process workers use this process's setting
+    dtype = getdtype(dtype)
+
+    if (pool == "process"):
+        executor = ProcessPoolExecutor(nworkers)
+    else:
+        executor = ThreadPoolExecutor(nworkers)
+
+    with executor:
+        futures = {}
+        for dirname, varname in varlist:
+            if (ndim == 0):
+                futures[dirname, varname] = executor.submit(get0Dvar, simname, dirname, varname, tstart, tend, dtype)
+            else:
+                futures[dirname, varname] = executor.submit(get1Dvar, simname, dirname, varname, tsel, tstart, tend, dtype)
 
-    return var
+        vars = {}
+        for key, future in futures.items():
+            vars[key] = future.result()
 
+    return vars
@@ -0,0 +1,231 @@
+#==================================================================================================
+# reduce.py - time-aggregate statistics of height-time output without loading whole files
+#
+# Statistics over time are computed independently for every height, so the
+# output files are processed a block of heights at a time: from the binary
+# cache if it is current, or otherwise straight from the text file, converting
+# only the output times that are needed.  Memory use is bounded by blockbytes
+# however long the simulation is.
+#
+import os
+import itertools
+import numpy as np
+from .datacache import filestamp
+from .memcache import getmem
+from .pltutils import timekeys64, timewindow, get1Dvar, getdtype, loadentry
+
+blockbytes = 64*1024*1024      # target size of one block of heights (bytes)
+
+# resampling frequencies, as datetime64 units of the group or "diurnal" for the hour of the day
+freqs = {"hourly": "h", "daily": "D", "diurnal": None}
+
+def hourofday(dts):
+    """Returns the hour of the day of datetimes, the key of the diurnal groups
+
+    Args:
+       dts (numpy datetime64 array) : datetimes
+
+    Returns:
+       hour (numpy int array)       : hour of the day (0-23)
+    """
+    return (dts-dts.astype("datetime64[D]")).astype("timedelta64[h]").astype(int)
+
+def iterblocks(simname, dirname, varname, cols, dtype=None):
+    """Yields the data of a height-time output file a block of heights at a time
+
+    Args:
+       simname (str)         : ACCESS simulation name
+       dirname (str)         : name of the simulation output directory
+       varname (str)         : variable name
+       cols    (numpy array) : time slices (t0 = 0) to read
+       dtype   (str)         : numpy float dtype to parse into, default is the global one
+
+    Returns:
+       blocks (generator)    : (z, var) for successive blocks of heights, var of shape (nzblock, len(cols))
+    """
+    fnvar = os.getcwd()+"/"+simname+"/"+dirname+"/"+varname+".dat"
+    dtype = getdtype(dtype)
+    nrows = max(1, blockbytes//(dtype.itemsize*max(1, len(cols))))
+
+    # data already loaded in this session, or the memory-mapped binary cache
+    full = getmem(("get1Dvar", fnvar, filestamp(fnvar), dtype.name))
+    if (full is not None):
+        z, var = full
+        for k in range(0, len(z), nrows):
+            yield z[k:k+nrows], var[k:k+nrows, cols]
+        return
+
+    cached = loadentry(simname, dirname, varname, fnvar, ["z", "var"], dtype)
+    if (cached is not None):
+        z, var = cached["z"], cached["var"]          # var is time-major
+        for k in range(0, len(z), nrows):
+            yield z[k:k+nrows], var[cols, k:k+nrows].T
+        return
+
+    # otherwise parse the text file, only the needed columns of a block of lines at a time
+    with open(fnvar) as fhvar:
+        fhvar.readline()
+        usecols = [0]+list(cols+1)
+        while True:
+            lines = list(itertools.islice(fhvar, nrows))
+            if (not lines):
+                break
+            dat = np.loadtxt(lines, usecols=usecols, ndmin=2, dtype=dtype)
+            yield dat[:, 0], dat[:, 1:]
+
+def timegroups(simname, freq=None, hours=None, tstart=None, tend=None):
+    """Selects the output times to reduce and groups them for resampling
+
+    Args:
+       simname (str)             : ACCESS simulation name
+       freq    (str)             : "hourly", "daily" or "diurnal" (by hour of the day),
+                                   default is one group of all times
+       hours   (tuple)           : (first, last) hour of the day to include, e.g. (6, 18) for daytime
+                                   (first <= hour < last, optional)
+       tstart  (datetime or str) : start of a time window (optional)
+       tend    (datetime or str) : end of a time window (optional)
+
+    Returns:
+       cols   (numpy array)      : time slices (t0 = 0) in group order
+       starts (numpy array)      : index in cols of the first time of each group
+       labels (list(str))        : label of each group
+    """
+    dts, hrs = timekeys64(simname)
+    tw  = timewindow(simname, tstart, tend)
+    cols = np.arange(tw.start, tw.stop)
+
+    if (hours is not None):
+        hour = hourofday(dts[cols])
+        cols = cols[(hour >= hours[0]) & (hour < hours[1])]
+
+    if (freq is None):
+        return cols, np.zeros(1, dtype=int), ["all"]
+
+    if (freq not in freqs):
+        raise ValueError("Unknown resampling frequency: "+str(freq))
+    if (freqs[freq] is None):
+        keys = hourofday(dts[cols])
+    else:
+        keys = dts[cols].astype("datetime64["+freqs[freq]+"]")
+
+    # sort the times by group, keeping time order within each group
+    ukeys, gids = np.unique(keys, return_inverse=True)
+    order  = np.argsort(gids, kind="stable")
+    starts = np.searchsorted(gids[order], np.arange(len(ukeys)))
+    if (freqs[freq] is None):
+        labels = ["%02d:00" % key for key in ukeys]
+    else:
+        labels = [str(key).replace("T", " ")+(":00" if freq == "hourly" else "") for key in ukeys]
+
+    return cols[order], starts, labels
+
+def groupstat(var, starts, stat):
+    """Computes a statistic over time for each group of consecutive columns
+
+    Args:
+       var    (numpy 2D array) : data of a block of heights, columns sorted by group
+       starts (numpy array)    : index of the first column of each group
+       stat   (str)            : "mean", "min", "max", "std", "median", or "pNN" for the NN-th percentile
+
+    Returns:
+       red (numpy 2D array)    : statistic for each height and group
+    """
+    counts = np.diff(np.append(starts, var.shape[1]))
+    ncount = counts.astype(var.dtype)         # divide without promoting float32 data
+
+    if (stat == "mean"):
+        return np.add.reduceat(var, starts, axis=1)/ncount
+    if (stat == "min"):
+        return np.minimum.reduceat(var, starts, axis=1)
+    if (stat == "max"):
+        return np.maximum.reduceat(var, starts, axis=1)
+    if (stat == "std"):
+        dev = var - np.repeat(np.add.reduceat(var, starts, axis=1)/ncount, counts, axis=1)
+        return np.sqrt(np.add.reduceat(dev*dev, starts, axis=1)/ncount)
+    if (stat == "median" or stat.startswith("p")):
+        q = 50. if (stat == "median") else float(stat[1:])
+        ends = starts+counts
+        return np.stack([np.percentile(var[:, i0:i1], q, axis=1) for i0, i1 in zip(starts, ends)], axis=1)
+
+    raise ValueError("Unknown statistic: "+str(stat))
+
+def reduce1Dvar(simname, dirname, varname, stats=("mean",), freq=None, hours=None, tstart=None, tend=None,
+                dtype=None):
+    """Computes statistics over time of a height-time output file, a block of
+       heights at a time
+
+    Args:
+       simname (str)             : ACCESS simulation name
+       dirname (str)             : name of the simulation output directory
+       varname (str)             : variable name
+       stats   (list(str))       : statistics, each "mean", "min", "max", "std", "median", or
+                                   "pNN" for the NN-th percentile (e.g., "p90")
+       freq    (str)             : "hourly", "daily" or "diurnal" to resample, default is over all times
+       hours   (tuple)           : (first, last) hour of the day to include, e.g. (6, 18) for daytime
+                                   (first <= hour < last, optional)
+       tstart  (datetime or str) : start of a time window (optional)
+       tend    (datetime or str) : end of a time window (optional)
+       dtype   (str)             : numpy float dtype to parse into, default is the global one
+
+    Returns:
+       z (numpy 1D array)        : domain vertical levels (m)
+       red (dict)                : profiles by statistic, of shape (nz) without freq,
+                                   or (nz, ngroups) with one column per group
+       labels (list(str))        : label of each group (e.g., "2018-07-01" for daily)
+    """
+    cols, starts, labels = timegroups(simname, freq, hours, tstart, tend)
+    if (len(cols) == 0):
+        raise ValueError("No output times to reduce")
+
+    zs = []
+    parts = {stat: [] for stat in stats}
+    for z, var in iterblocks(simname, dirname, varname, cols, dtype):
+        zs.append(np.array(z))
+        for stat in stats:
+            parts[stat].append(groupstat(np.asarray(var), starts, stat))
+
+    z   = np.concatenate(zs)
+    red = {}
+    for stat in stats:
+        red[stat] = np.concatenate(parts[stat], axis=0)
+        if (freq is None):
+            red[stat] = red[stat][:, 0]
+
+    return z, red, labels
+
+def diurnal1Dvar(simname, dirname, varname, tstart=None, tend=None):
+    """Computes diurnal composite profiles of a height-time output file, the
+       mean and standard deviation over all days for each hour of the day
+
+    The time columns are grouped by hour in one step, as products with a
+    one-hot (time, hour) matrix.
+
+    Args:
+       simname (str)             : ACCESS simulation name
+       dirname (str)             : name of the simulation output directory
+       varname (str)             : variable name
+       tstart  (datetime or str) : start of a time window (optional)
+       tend    (datetime or str) : end of a time window (optional)
+
+    Returns:
+       z (numpy 1D array)        : domain vertical levels (m)
+       mean (numpy 2D array)     : composite mean, one column per hour with output
+       std (numpy 2D array)      : standard deviation about the composite mean
+       hours (numpy 1D array)    : hour of the day (0-23) of each column
+    """
+    dts, hrs = timekeys64(simname, tstart, tend)
+    z, var = get1Dvar(simname, dirname, varname, tstart=tstart, tend=tend)
+    if (len(dts) == 0):
+        raise ValueError("No output times to composite")
+
+    hour   = hourofday(dts)
+    onehot = (hour[:, None] == np.arange(24)).astype(var.dtype)
+    counts = onehot.sum(axis=0)
+    hours  = np.nonzero(counts)[0]
+    onehot = onehot[:, hours]/counts[hours]
+
+    mean = var @ onehot
+    dev  = var - mean[:, np.searchsorted(hours, hour)]
+    std  = np.sqrt((dev*dev) @ onehot)
+
+    return z, mean, std, hours
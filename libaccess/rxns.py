@@ -5,34 +5,179 @@
 # Rick D. Saylor, August 2018
 #
 import os
-from matplotlib import use
-use("WXAgg")
-import matplotlib.pylab as plt
+import hashlib
 import numpy as np
-import seaborn as sns
-from .pltutils import pltoutput, timekeys, get1Dvar, setstdfmts
-
-# set colors
-colors = ["gray", "peru", "brown", "red", "royalblue", "green", "violet", "magenta", "cyan", "olive"]
-
-# set common figure formatting parameters
-tfsize   = 18     # plot title font size
-tyloc    = 1.02   # plot title y location
-lfsize   = 14     # legend font size
-yfsize   = 18     # y-axis title font size
-ylabpad  = 10     # y-axis title padding
-xfsize   = 18     # x-axis title font size
-xlabpad  = 10     # x-axis title padding
-tlmaj    =  6     # major tick length
-tlmin    =  4     # minor tick length
-tlbsize  = 17     # tick label font size
-tlbpad   =  3     # tick label padding
-lnwdth   = 1.5    # linewidth
+from . import datacache, reduce
+from .datacache import savecache, loadcache, filestamp, cachename, openarray
+from .memcache import getmem, putmem
+from .pltutils import loaddat, loadentry, getdtype, timekeys64, timewindow, todatetime, trapezoid
+from .panels import plotpanels
+
+def rxnname(rxnnum):
+    """Returns the variable name of a reaction's output file
+
+    Args:
+       rxnnum (int)   : reaction number
+
+    Returns:
+       name (str)     : variable name, e.g. "rxn00042"
+    """
+    return "rxn"+str(rxnnum).zfill(5)
+
+def getrxnnums(simname, dirname):
+    """Returns the numbers of the reactions with output in a directory
+
+    Args:
+       simname (str)           : ACCESS simulation name
+       dirname (str)           : simulation output directory, either "rates" or "ks"
+
+    Returns:
+       rxnnums (numpy 1D array) : reaction numbers, in increasing order
+    """
+    rdir = os.getcwd()+"/"+simname+"/"+dirname
+    nums = [int(fname[3:-4]) for fname in os.listdir(rdir)
+            if fname.startswith("rxn") and fname.endswith(".dat") and fname[3:-4].isdigit()]
+
+    return np.array(sorted(nums), dtype=int)
+
+def getrxns(simname, dirname, dtype=None):
+    """Reads the output of every reaction in a directory as one array
+
+    The array is kept as a single entry of the binary cache, identified by
+    the stamps of all the reaction files, so later calls memory-map it
+    instead of parsing thousands of files.  It is built in the cache file
+    one reaction at a time, so only one reaction is held in memory (in
+    memory only if the disk cache is off or cannot be written).  Files are
+    read from their own cache entries if those are current.
+
+    Args:
+       simname (str)            : ACCESS simulation name
+       dirname (str)            : simulation output directory, either "rates" or "ks"
+       dtype   (str)            : numpy float dtype to parse into, default is the global one
+
+    Returns:
+       rxnnums (numpy 1D array) : reaction numbers
+       z (numpy 1D array)       : domain vertical levels (m)
+       rxns (numpy 3D array)    : rates (or rate coefficients) of shape (nrxn, nz, ntimes)
+    """
+    rdir  = os.getcwd()+"/"+simname+"/"+dirname
+    dtype = getdtype(dtype)
+    nums  = getrxnnums(simname, dirname)
+    if (len(nums) == 0):
+        raise ValueError("No reaction output in "+rdir)
+
+    fnvars = [rdir+"/"+rxnname(num)+".dat" for num in nums]
+    stamp  = hashlib.md5("\n".join(fnvar+" "+str(filestamp(fnvar)) for fnvar in fnvars).encode()).hexdigest()
+
+    key = ("getrxns", rdir, stamp, dtype.name)
+    cached = getmem(key)
+    if (cached is not None):
+        return cached
+
+    name = cachename("rxnall", dtype)
+    cached = loadcache(simname, dirname, name, rdir, ["rxnnums", "z", "rxns"], stamp)
+    if (cached is not None):
+        return putmem(key, (cached["rxnnums"], cached["z"], cached["rxns"]))
+
+    rxns = None
+    for i, num in enumerate(nums):
+        entry = loadentry(simname, dirname, rxnname(num), fnvars[i], ["z", "var"], dtype)
+        if (entry is not None):
+            z, var = entry["z"], entry["var"].T
+        else:
+            dat = loaddat(fnvars[i], dtype=dtype)
+            z, var = dat[:, 0], dat[:, 1:]
+        if (rxns is None):
+            zs = np.array(z)
+            shape = (len(nums),)+var.shape
+            if (datacache.usecache):
+                try:
+                    rxns = openarray(simname, dirname, name, "rxns", shape, dtype)
+                except OSError:
+                    pass
+            if (rxns is None):
+                rxns = np.empty(shape, dtype=dtype)
+        rxns[i] = var
+
+    savecache(simname, dirname, name, rdir, {"rxnnums": nums, "z": zs, "rxns": rxns}, stamp)
+
+    # return the memory-mapped copy from the cache
+    cached = loadcache(simname, dirname, name, rdir, ["rxnnums", "z", "rxns"], stamp)
+    if (cached is not None):
+        return putmem(key, (cached["rxnnums"], cached["z"], cached["rxns"]))
+
+    return putmem(key, (nums, zs, rxns))
+
+def toprxns(simname, dirname, n=10, z=None, t=None, zmax=None, tstart=None, tend=None, dtype=None):
+    """Ranks the reactions with the largest rates (or rate coefficients)
+
+    With z and t, reactions are ranked by their value at that height and
+    output time.  Otherwise they are ranked by their rate integrated over the
+    column (below zmax, if given) and over time (in the window, if given),
+    a block of reactions at a time so memory use is bounded by
+    reduce.blockbytes.  Only the n largest are sorted.
+
+    Args:
+       simname (str)             : ACCESS simulation name
+       dirname (str)             : simulation output directory, either "rates" or "ks"
+       n       (int)             : number of reactions to return
+       z       (float)           : height (m), the nearest level is used (optional)
+       t       (int, datetime or str) : output time, a time slice (t0 = 0) or the last output time
+                                   at or before a datetime (optional)
+       zmax    (float)           : top of the column integration (m) (optional)
+       tstart  (datetime or str) : start of the time integration window (optional)
+       tend    (datetime or str) : end of the time integration window (optional)
+       dtype   (str)             : numpy float dtype to parse into, default is the global one
+
+    Returns:
+       rxnnums (numpy 1D array)  : numbers of the top reactions, largest first
+       values (numpy 1D array)   : their values at (z, t), or integrated rates
+                                   (molec cm-2 for rates, with z in m converted to cm)
+    """
+    if ((z is None) != (t is None)):
+        raise ValueError("Both z and t are needed to rank at one height and time")
+
+    nums, zs, rxns = getrxns(simname, dirname, dtype)
+
+    if (z is not None):
+        iz = int(np.abs(zs-z).argmin())
+        if (isinstance(t, (int, np.integer))):
+            it = int(t)
+        else:
+            dts, hrs = timekeys64(simname)
+            it = int(np.searchsorted(dts, np.datetime64(todatetime(t)), "right"))-1
+        if (it < 0 or it >= rxns.shape[2]):
+            raise ValueError("No output time "+str(t))
+        values = np.asarray(rxns[:, iz, it], dtype=float)
+    else:
+        nz = len(zs) if (zmax is None) else int(np.searchsorted(zs, zmax, "right"))
+        tw = timewindow(simname, tstart, tend)
+
+        dts, hrs = timekeys64(simname)
+        tsec = (dts[tw]-dts[0]).astype("timedelta64[s]").astype(float)
+        nrxn = max(1, reduce.blockbytes//(rxns.dtype.itemsize*max(1, nz*len(tsec))))
+
+        # column integral at each time (cm), then over time (s), for each block of reactions
+        blocks = []
+        for k in range(0, len(nums), nrxn):
+            col = trapezoid(rxns[k:k+nrxn, :nz, tw], 100.*zs[:nz], axis=1)
+            if (col.shape[1] > 1):
+                blocks.append(trapezoid(col, tsec, axis=1))
+            else:
+                blocks.append(col[:, 0] if (col.shape[1] == 1) else np.zeros(len(col)))
+        values = np.concatenate(blocks)
+
+    # partial selection of the n largest, then sort only those
+    n = min(n, len(nums))
+    top = np.argpartition(-values, n-1)[:n]
+    top = top[np.argsort(-values[top], kind="stable")]
+
+    return nums[top], values[top]
 
 ###########################################################################################################
 # plotprofs - create a one-panel figure for a defined species variable
 #
-def plotprofs(simname, dirname, rxnnum, outtype, intdt, zmax, xmax, hc):
+def plotprofs(simname, dirname, rxnnum, outtype, intdt, zmax, xmax, hc, tstart=None, tend=None, outfn=None):
     """Create a one-panel vertical profile figure for a defined species variable    
 
     Args:
@@ -44,69 +189,26 @@ def plotprofs(simname, dirname, rxnnum, outtype, intdt, zmax, xmax, hc):
        zmax     (float) : height of the top of the plotted domain (m)
        xmax     (float) : maximum value on x-axis
        hc       (flost) : canopy height (m)
+       tstart   (datetime) : start of a time window to plot, or "YYYY-MM-DD HH:MM:SS" (optional)
+       tend     (datetime) : end of a time window to plot (optional)
+       outfn    (str)   : string for output file name, default is dirname
 
     Returns:
-       Nothing
+       fig (obj)        : matplotlib Figure
     """
-    # read elapsed hour/datetime key file
-    dts, hrs = timekeys(simname)
-
-    # get data for the specified reaction
-    srxnnum = "rxn"+str(rxnnum).zfill(5)
-    z, var = get1Dvar(simname, dirname, srxnnum)
-
-    nts = var.shape[1]        # number of time slices 
-
-    # create the plot
-    fig, ax = plt.subplots(1, 1, figsize=(8, 10))
-
-    # plot one line for each time with intdt interval  
-    ic = 0                    # color array index
-    for m in range(nts):
-        if ( (m % intdt) == 0):
-            labstr = hrs[m]
-            plt.plot(var[:, m], z, color=colors[ic], linestyle="-", linewidth=lnwdth, label=labstr)
-            ic+=1
-            if (ic > len(colors)-1):    # cycle back through the colors
-                ic = 0
-
-    # limit to specified height
-    nz = len(z)
-    if (zmax == -1.):
-        zmax = z[nz-1]
-    plt.ylim(-0.1, zmax)
-    if (xmax != -1.):
-        plt.xlim(-0.1, xmax)
-
-    # draw line showing canopy height, if applicable
-    if (zmax > hc):
-        ahc = [hc, hc]
-        xbnds = list(ax.get_xlim())
-        plt.plot(xbnds, ahc, color='0.25', linestyle='--', linewidth=lnwdth)
-        plt.xlim(xbnds[0], xbnds[1])
-
     # set labels and title
     if (dirname == "rates"):
         varunits = "molec cm$^{-3}$ s$^{-1}$"
         vartitle = "Rxn Rate: #"+str(rxnnum) 
-        outfn = "rates"
     else:
         varunits = "molec-cm-s units"
         vartitle = "Rate Coef: #"+str(rxnnum) 
-        outfn = "ks"
-
-    plt.xlabel(varunits, fontsize=xfsize, labelpad=xlabpad)
-    plt.ylabel("z (m)", fontsize=yfsize, labelpad=ylabpad)
-    plt.title(vartitle+" - "+simname, fontsize=tfsize, y=tyloc)
-
-    # set standard formatting
-    setstdfmts(ax, tlmaj, tlmin, tlbsize, tlbpad)
 
-    # add legend
-    plt.legend(loc=4, fontsize=lfsize, bbox_to_anchor=(0.99, 0.10))
+    spec = {"dirname": dirname, "varname": rxnname(rxnnum), "varunits": varunits,
+            "vartitle": vartitle+" - "+simname, "ztop": zmax, "xmax": xmax, "hc": hc}
 
-    # create output
-    pltoutput(simname, outfn, outtype)
+    if (outfn is None):
+        outfn = "rates" if (dirname == "rates") else "ks"
 
-    return
+    return plotpanels(simname, [spec], outtype, outfn, intdt, tstart=tstart, tend=tend)
 
@@ -10,7 +10,7 @@ setup(name='libaccess',
       install_requires=[
           'seaborn',
           'matplotlib',
-          'numpy',
+          'numpy>=1.23',
           'datetime',
       ],
       zip_safe=False)   
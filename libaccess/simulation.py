@@ -0,0 +1,282 @@
+#==================================================================================================
+# simulation.py - an ACCESS simulation and an index of its output variables
+#
+# The output directories of a simulation (met, canopy, budget, rates, ks, gas, ...)
+# are scanned once, and the kind and shape of each variable are found only when
+# first asked for (from the converted store manifest if it is current), so listing,
+# validating and bulk loading hundreds of species or reactions needs no further
+# probing of the filesystem.
+#
+# Usage:
+#
+#    sim = Simulation("sim1")
+#    sim.varnames("gas")                  # species with output
+#    z, tk = sim.get("met", "tk")         # read through the pltutils readers
+#    spc = sim.getall("gas")              # all height-time species at once
+#
+import os
+from .datacache import filestamp
+from .pltutils import timekeys64, get1Dvar, get0Dvar, getvars
+from .store import getmanifest
+
+class Simulation:
+    """An ACCESS simulation in the current directory and the index of its output"""
+
+    def __init__(self, simname):
+        """Creates the simulation, the index is built on first use
+
+        Args:
+           simname (str)  : ACCESS simulation name, relative to the current directory
+
+        Returns:
+           Nothing
+        """
+        self.simname = simname
+        self.simdir  = os.getcwd()+"/"+simname
+        if (not os.path.isdir(self.simdir)):
+            raise FileNotFoundError("No ACCESS simulation at "+self.simdir)
+
+        self.index    = None       # {dirname: {varname: path}}
+        self.manifest = None       # converted store manifest, {} if not converted
+        self.shapes   = {}         # (kind, shape, stamp) by (dirname, varname)
+
+    def __repr__(self):
+        return "Simulation("+repr(self.simname)+")"
+
+    def getindex(self):
+        """Returns the index of output files, scanning the directories on first use
+
+        Args:
+           None
+
+        Returns:
+           index (dict)   : {dirname: {varname: path of the .dat file}}
+        """
+        if (self.index is None):
+            self.refresh()
+
+        return self.index
+
+    def refresh(self):
+        """Rescans the output directories and rereads the store manifest, e.g.
+           after the simulation wrote new files
+
+        Args:
+           None
+
+        Returns:
+           Nothing
+        """
+        index = {}
+        for entry in sorted(os.scandir(self.simdir), key=lambda e: e.name):
+            if (not entry.is_dir() or entry.name.startswith(".")):
+                continue
+            files = {}
+            for fentry in sorted(os.scandir(entry.path), key=lambda e: e.name):
+                if (fentry.name.endswith(".dat") and fentry.is_file()):
+                    files[fentry.name[:-4]] = fentry.path
+            index[entry.name] = files
+
+        self.index    = index
+        self.manifest = getmanifest(self.simname) or {}
+        self.shapes   = {}
+
+        return
+
+    def dirnames(self):
+        """Returns the names of the output directories
+
+        Args:
+           None
+
+        Returns:
+           dirnames (list(str)) : output directory names
+        """
+        return list(self.getindex())
+
+    def varnames(self, dirname, kind=None):
+        """Returns the names of the variables of an output directory
+
+        Args:
+           dirname (str)        : name of the simulation output directory
+           kind    (str)        : only list "1D" (height-time) or "0D" (time only) variables (optional)
+
+        Returns:
+           varnames (list(str)) : variable names
+        """
+        index = self.getindex()
+        if (dirname not in index):
+            raise KeyError("No output directory "+dirname+" in "+self.simname)
+
+        if (kind is None):
+            return list(index[dirname])
+
+        return [varname for varname in index[dirname] if self.shape(dirname, varname)[0] == kind]
+
+    def has(self, dirname, varname):
+        """Tells whether a variable has output
+
+        Args:
+           dirname (str)  : name of the simulation output directory
+           varname (str)  : variable name
+
+        Returns:
+           found (bool)   : True if the .dat file exists
+        """
+        return varname in self.getindex().get(dirname, {})
+
+    def path(self, dirname, varname):
+        """Returns the path of the output file of a variable
+
+        Args:
+           dirname (str)  : name of the simulation output directory
+           varname (str)  : variable name
+
+        Returns:
+           fnvar (str)    : path of the .dat file
+        """
+        if (not self.has(dirname, varname)):
+            raise KeyError("No output for "+dirname+"/"+varname+" in "+self.simname)
+
+        return self.index[dirname][varname]
+
+    def ntimes(self):
+        """Returns the number of output times
+
+        Args:
+           None
+
+        Returns:
+           ntimes (int)   : number of output times
+        """
+        dts, hrs = timekeys64(self.simname)
+
+        return len(dts)
+
+    def timekeys(self):
+        """Returns the datetimes and hour strings of the output times
+
+        Args:
+           None
+
+        Returns:
+           dts (numpy datetime64 array) : datetimes corresponding to simulation output times
+           hrs (numpy str array)        : strings corresponding to the hour (24-hr clock)
+        """
+        return timekeys64(self.simname)
+
+    def shape(self, dirname, varname):
+        """Returns the kind and shape of a variable, found on first use
+
+        As in the store, a file is a height-time (1D) variable if its header
+        defines one column per output time, and a time only (0D) variable if it
+        has one line per output time; other files have kind None.
+
+        Args:
+           dirname (str)  : name of the simulation output directory
+           varname (str)  : variable name
+
+        Returns:
+           kind  (str)    : "1D", "0D", or None
+           shape (tuple)  : (nz, ntimes) for 1D, (ntimes,) for 0D, or None
+        """
+        fnvar = self.path(dirname, varname)
+        stamp = filestamp(fnvar)
+
+        known = self.shapes.get((dirname, varname))
+        if (known is not None and known[2] == stamp):
+            return known[0], known[1]
+
+        # use the store manifest if its entry is current
+        entry = self.manifest.get(dirname, {}).get(varname)
+        if (entry is not None and entry["stamp"] == stamp):
+            kind, shape = entry["kind"], tuple(entry["shape"])
+        else:
+            kind, shape = self.scanshape(fnvar)
+
+        self.shapes[dirname, varname] = (kind, shape, stamp)
+
+        return kind, shape
+
+    def scanshape(self, fnvar):
+        """Finds the kind and shape of an output file from its header and line count
+
+        Args:
+           fnvar (str)    : path of the .dat file
+
+        Returns:
+           kind  (str)    : "1D", "0D", or None
+           shape (tuple)  : (nz, ntimes) for 1D, (ntimes,) for 0D, or None
+        """
+        ntimes = self.ntimes()
+
+        with open(fnvar, "rb") as fhvar:
+            ncols  = len(fhvar.readline().split())
+            nlines = 0
+            for chunk in iter(lambda: fhvar.read(1024*1024), b""):
+                nlines+=chunk.count(b"\n")
+
+        if (ncols-1 == ntimes):
+            return "1D", (nlines, ntimes)
+        if (nlines == ntimes):
+            return "0D", (ntimes,)
+
+        return None, None
+
+    def get(self, dirname, varname, tsel=None, tstart=None, tend=None, dtype=None):
+        """Reads a variable with the pltutils reader for its kind (cached)
+
+        Args:
+           dirname (str)        : name of the simulation output directory
+           varname (str)        : variable name
+           tsel    (int, slice, or list of int) : time slice(s) of a height-time variable (optional)
+           tstart  (datetime or str) : start of a time window (optional)
+           tend    (datetime or str) : end of a time window (optional)
+           dtype   (str)        : numpy float dtype to parse into (optional)
+
+        Returns:
+           z, var               : for a height-time variable, as returned by get1Dvar
+           var                  : for a time only variable, as returned by get0Dvar
+        """
+        kind, shape = self.shape(dirname, varname)
+
+        if (kind == "1D"):
+            return get1Dvar(self.simname, dirname, varname, tsel, tstart, tend, dtype)
+        if (kind == "0D"):
+            return get0Dvar(self.simname, dirname, varname, tstart, tend, dtype)
+
+        raise ValueError(dirname+"/"+varname+" is not a height-time or time only output file")
+
+    def getall(self, dirname, varnames=None, tsel=None, tstart=None, tend=None, dtype=None, nworkers=None):
+        """Reads many variables of one output directory concurrently
+
+        Args:
+           dirname  (str)        : name of the simulation output directory
+           varnames (list(str))  : variables to read, default is all of the directory's
+                                   height-time variables (or time only ones if it has none)
+           tsel     (int, slice, or list of int) : time slice(s) of height-time variables (optional)
+           tstart   (datetime or str) : start of a time window (optional)
+           tend     (datetime or str) : end of a time window (optional)
+           dtype    (str)        : numpy float dtype to parse into (optional)
+           nworkers (int)        : number of concurrent readers (optional)
+
+        Returns:
+           vars (dict)           : data by varname, as returned by get
+        """
+        if (varnames is None):
+            varnames = self.varnames(dirname, "1D") or self.varnames(dirname, "0D")
+
+        # validate everything before reading anything
+        kinds = {varname: self.shape(dirname, varname)[0] for varname in varnames}
+        for varname, kind in kinds.items():
+            if (kind is None):
+                raise ValueError(dirname+"/"+varname+" is not a height-time or time only output file")
+
+        vars = {}
+        for kind, ndim in (("1D", 1), ("0D", 0)):
+            names = [(dirname, varname) for varname in varnames if kinds[varname] == kind]
+            if names:
+                data = getvars(self.simname, names, tsel, tstart, tend, ndim, nworkers, dtype=dtype)
+                vars.update({varname: data[dirname, varname] for _, varname in names})
+
+        return vars
@@ -0,0 +1,169 @@
+#==================================================================================================
+# store.py - converts the text output of an ACCESS simulation to a columnar binary store
+#
+# Every .dat file of the simulation is written as memory-mappable .npy arrays in the
+# <simname>/.npcache/ directory used by the pltutils readers, with a manifest of the
+# converted variables, so that later reads never touch the text files.
+#
+# Usage:  python -m libaccess.store [-d DIRNAME ...] [-f] simname [simname ...]
+#
+import os
+import sys
+import json
+import time
+import argparse
+import numpy as np
+from .datacache import getcachedir, filestamp, writeentry, readstamp, cachename
+from .pltutils import timekeys64, loaddat
+
+def getmanifest(simname):
+    """Reads the manifest of the converted store of an ACCESS simulation
+
+    Args:
+       simname (str)     : ACCESS simulation name
+
+    Returns:
+       manifest (dict)   : {dirname: {varname: {"kind", "shape", "stamp", "dtype"}}}, or None
+                           if the simulation has not been converted
+    """
+    try:
+        with open(getcachedir(simname)+"/manifest.json") as fh:
+            return json.load(fh)
+    except (OSError, ValueError):
+        return None
+
+def convertvar(simname, dirname, varname, ntimes, dtype="float64"):
+    """Converts one .dat output file to the store
+
+    A file is a height-time (1D) variable if its header defines one column per
+    output time, and a time only (0D) variable if it has one line per output
+    time.  Any other file (e.g., laiprof.dat) is not converted.
+
+    Args:
+       simname (str)     : ACCESS simulation name
+       dirname (str)     : name of the simulation output directory
+       varname (str)     : variable name
+       ntimes  (int)     : number of simulation output times
+       dtype   (str)     : numpy float dtype the data are stored as
+
+    Returns:
+       entry (dict)      : manifest entry for the variable, or None if not converted
+    """
+    fnvar = os.getcwd()+"/"+simname+"/"+dirname+"/"+varname+".dat"
+
+    with open(fnvar) as fhvar:
+        ncols = len(fhvar.readline().split())
+
+    if (ncols-1 == ntimes):
+        dat    = loaddat(fnvar, dtype=dtype)
+        kind   = "1D"
+        # stored time-major, as in get1Dvar
+        arrays = {"z": dat[:, 0].copy(), "var": np.ascontiguousarray(dat[:, 1:].T)}
+        shape  = [dat.shape[0], dat.shape[1]-1]
+    else:
+        try:
+            dat = loaddat(fnvar, usecols=[1], dtype=dtype)
+        except (ValueError, IndexError):
+            return None
+        if (dat.shape[0] != ntimes):
+            return None
+        kind   = "0D"
+        arrays = {"var": dat[:, 0].copy()}
+        shape  = [dat.shape[0]]
+
+    stamp = writeentry(simname, dirname, cachename(varname, dtype), fnvar, arrays)
+
+    return {"kind": kind, "shape": shape, "stamp": stamp, "dtype": np.dtype(dtype).name}
+
+def convertsim(simname, dirnames=None, force=False, verbose=False, dtype="float64"):
+    """Converts the .dat output files of an ACCESS simulation to the store
+
+    Files whose store entry is already current are not converted again unless
+    force is set.
+
+    Args:
+       simname  (str)       : ACCESS simulation name
+       dirnames (list(str)) : simulation output directories to convert, default is all
+       force    (bool)      : reconvert files with current store entries
+       verbose  (bool)      : print a line for each converted file
+       dtype    (str)       : numpy float dtype the data are stored as, read back by the
+                              readers set to the same dtype (see pltutils.setdtype)
+
+    Returns:
+       manifest (dict)      : manifest of the converted store
+    """
+    simdir = os.getcwd()+"/"+simname
+
+    dts, hrs = timekeys64(simname)
+    ntimes = len(dts)
+
+    if (dirnames is None):
+        dirnames = [d for d in sorted(os.listdir(simdir))
+                    if os.path.isdir(simdir+"/"+d) and not d.startswith(".")]
+
+    manifest = getmanifest(simname) or {}
+
+    for dirname in dirnames:
+        old     = manifest.get(dirname, {})
+        entries = {}
+        for fname in sorted(os.listdir(simdir+"/"+dirname)):
+            if (not fname.endswith(".dat")):
+                continue
+            varname = fname[:-4]
+
+            # skip files already current in the store
+            stamp = filestamp(simdir+"/"+dirname+"/"+fname)
+            if (not force and varname in old and old[varname]["stamp"] == stamp
+                    and old[varname].get("dtype", "float64") == np.dtype(dtype).name
+                    and readstamp(simname, dirname, cachename(varname, dtype)) == stamp):
+                entries[varname] = old[varname]
+                continue
+
+            entry = convertvar(simname, dirname, varname, ntimes, dtype)
+            if (entry is None):
+                if verbose:
+                    print("skipped "+dirname+"/"+fname)
+                continue
+            entries[varname] = entry
+            if verbose:
+                print("converted "+dirname+"/"+fname+" "+entry["kind"]+" "+str(entry["shape"]))
+
+        manifest[dirname] = entries
+
+    # write the manifest last, replacing any older one in one step
+    os.makedirs(getcachedir(simname), exist_ok=True)
+    fnman = getcachedir(simname)+"/manifest.json"
+    with open(fnman+".tmp", "w") as fh:
+        json.dump(manifest, fh, indent=1, sort_keys=True)
+    os.replace(fnman+".tmp", fnman)
+
+    return manifest
+
+def main(argv=None):
+    """Command line interface for converting ACCESS simulations to the store
+
+    Args:
+       argv (list(str))  : command line arguments, default is sys.argv[1:]
+
+    Returns:
+       status (int)      : exit status
+    """
+    parser = argparse.ArgumentParser(prog="python -m libaccess.store",
+                                     description="Convert ACCESS simulation output to a memory-mappable binary store")
+    parser.add_argument("simnames", nargs="+", help="ACCESS simulation name(s), relative to the current directory")
+    parser.add_argument("-d", "--dirname", action="append", dest="dirnames", help="only convert this output directory (repeatable)")
+    parser.add_argument("-f", "--force", action="store_true", help="reconvert files with current store entries")
+    parser.add_argument("-t", "--dtype", default="float64", help="numpy float dtype to store, e.g. float32")
+    parser.add_argument("-q", "--quiet", action="store_true", help="only print the summary")
+    args = parser.parse_args(argv)
+
+    for simname in args.simnames:
+        t0 = time.time()
+        manifest = convertsim(simname, args.dirnames, args.force, not args.quiet, args.dtype)
+        nvars = sum(len(entries) for entries in manifest.values())
+        print(simname+": "+str(nvars)+" variables in "+getcachedir(simname)+" (%.1f s)" % (time.time()-t0))
+
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
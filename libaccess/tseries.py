@@ -3,15 +3,9 @@
 #
 # Rick D. Saylor, July 2018
 #
-import os
-from matplotlib import use
-use("WXAgg")
-import matplotlib.pylab as plt
 import matplotlib.dates as mdates
-import numpy as np
-import seaborn as sns
-from datetime import datetime
-from .pltutils import pltoutput, timekeys, get0Dvar, setstdfmts
+from .backend import newfig
+from .pltutils import pltoutput, timekeys, getvars, setstdfmts
 
 # set figure formatting parameters
 tfsize   = 18     # plot title font size
@@ -31,76 +25,114 @@ msize    = 8      # marker size
 
 
 #######################################################################################################
-# plottsm - create a time series plot for multiple 0D variables
+# fmttimeaxis - format a time axis with days and hours
 #
-def plottsm(simname, dirname, varnames, varlabels, varunits, plttitle, plttype, scolors, outtype, outfn):
-    """Create a time series plot for multiple 0D (time only) variables from an
-       ACCESS simulation
+def fmttimeaxis(ax, nts):
+    """Formats the x-axis of a time series plot with day labels and hour ticks
 
     Args:
-       simname   (str)      : ACCESS simulation name
-       dirname   (str)      : simulation output directory
-       varnames  list(str)  : names of variables plotted
-       varlabels list(str)  : labels for variables
-       varunits  (str)      : units for variable
-       plttitle  (str)      : title for the plot
-       plttype   (str)      : type of plot, either "marker" or "line"
-       scolor    list(str)  : color names to use for markers or line
-       outtype   (str)      : either 'pdf', 'png', or 'x11'
-       outfn     (str)      : string for output file 
+       ax  (obj)   : axes of the plot
+       nts (int)   : number of output times plotted
 
     Returns:
        Nothing
     """
-    # read elapsed hour/datetime key file
-    dts, hrs = timekeys(simname)
-
-    # get variable values to plot
-    varx = {}
-    vlbs = {}
-    clrs = {}
-    for varname, varlabel, scolor in zip(varnames, varlabels, scolors):
-        dat = get0Dvar(simname, dirname, varname) 
-        varx[varname] = dat
-        clrs[varname] = scolor
-        vlbs[varname] = varlabel
+    days = mdates.DayLocator()
+    ax.xaxis.set_major_locator(days)
+    ax.xaxis.set_major_formatter(mdates.DateFormatter("%b %d"))
+    if (nts > 48):
+        hours = mdates.HourLocator(byhour=range(24), interval=4)
+    else:
+        hours = mdates.HourLocator(byhour=range(24), interval=1)
+    ax.xaxis.set_minor_locator(hours)
+
+    return
 
+#######################################################################################################
+# plottsdata - create a time series plot for data already in hand
+#
+def plottsdata(simname, dts, vardata, varlabels, varunits, plttitle, plttype, scolors, outtype, outfn, legbbox=(0.99, 0.65)):
+    """Create a time series plot for any number of time series already in hand
+
+    Args:
+       simname   (str)         : ACCESS simulation name
+       dts       (list)        : datetimes of the series
+       vardata   list(array)   : values of each series, one per output time
+       varlabels list(str)     : labels for the series
+       varunits  (str)         : units for the series
+       plttitle  (str)         : title for the plot
+       plttype   (str)         : type of plot, either "marker" or "line"
+       scolors   list(str)     : color names to use for markers or line
+       outtype   (str)         : either 'pdf', 'png', or 'x11'
+       outfn     (str)         : string for output file
+       legbbox   (tuple)       : legend anchor
+
+    Returns:
+       fig (obj)               : matplotlib Figure
+    """
     nts = len(dts)
 
     # create the plot
-    fig, ax = plt.subplots(1, 1, figsize=(12, 6))
+    fig = newfig(outtype, (12, 6))
+    ax  = fig.add_subplot(1, 1, 1)
 
     # line or marker plot?
-    for varname in varnames:
+    for dat, varlabel, scolor in zip(vardata, varlabels, scolors):
         if  (plttype == "marker"):
-            plt.plot(dts, varx[varname], color=clrs[varname], linestyle="None", marker="o", ms=msize, label=vlbs[varname])
+            ax.plot(dts, dat, color=scolor, linestyle="None", marker="o", ms=msize, label=varlabel)
         else:
-            plt.plot(dts, varx[varname], color=clrs[varname], linestyle="-", linewidth=lnwdth, label=vlbs[varname])
+            ax.plot(dts, dat, color=scolor, linestyle="-", linewidth=lnwdth, label=varlabel)
 
     # take care of time formatting on x-axis
-    days = mdates.DayLocator()
-    ax.xaxis.set_major_locator(days)
-    ax.xaxis.set_major_formatter(mdates.DateFormatter("%b %d"))
-    if (nts > 48):
-        hours = mdates.HourLocator(byhour=range(24), interval=4)
-    else:
-        hours = mdates.HourLocator(byhour=range(24), interval=1)
-    ax.xaxis.set_minor_locator(hours)
+    fmttimeaxis(ax, nts)
 
     # set standard formatting
     setstdfmts(ax, tlmaj, tlmin, tlbsize, tlbpad)
 
     # set y-axis label
-    plt.ylabel(varunits, fontsize=yfsize, labelpad=ylabpad)
+    ax.set_ylabel(varunits, fontsize=yfsize, labelpad=ylabpad)
 
     # add plot title
-    plt.title(plttitle+" - "+simname, fontsize=tfsize, y=tyloc)
+    ax.set_title(plttitle+" - "+simname, fontsize=tfsize, y=tyloc)
 
     # add legend
-    if (len(varnames) > 1):
-        plt.legend(loc=4, fontsize=lfszlg, bbox_to_anchor=(0.99, 0.65))
+    if (len(vardata) > 1):
+        ax.legend(loc=4, fontsize=lfszlg, bbox_to_anchor=legbbox)
 
     # create output
-    pltoutput(simname, outfn, outtype)
+    pltoutput(simname, outfn, outtype, fig)
 
-    return
+    return fig
+
+#######################################################################################################
+# plottsm - create a time series plot for multiple 0D variables
+#
+def plottsm(simname, dirname, varnames, varlabels, varunits, plttitle, plttype, scolors, outtype, outfn, tstart=None, tend=None):
+    """Create a time series plot for multiple 0D (time only) variables from an
+       ACCESS simulation
+
+    Args:
+       simname   (str)      : ACCESS simulation name
+       dirname   (str)      : simulation output directory
+       varnames  list(str)  : names of variables plotted
+       varlabels list(str)  : labels for variables
+       varunits  (str)      : units for variable
+       plttitle  (str)      : title for the plot
+       plttype   (str)      : type of plot, either "marker" or "line"
+       scolor    list(str)  : color names to use for markers or line
+       outtype   (str)      : either 'pdf', 'png', or 'x11'
+       outfn     (str)      : string for output file
+       tstart    (datetime) : start of a time window to plot, or "YYYY-MM-DD HH:MM:SS" (optional)
+       tend      (datetime) : end of a time window to plot (optional)
+
+    Returns:
+       fig (obj)            : matplotlib Figure
+    """
+    # read elapsed hour/datetime key file
+    dts, hrs = timekeys(simname, tstart, tend)
+
+    # get variable values to plot, all files at once
+    tsvars = getvars(simname, [(dirname, varname) for varname in varnames], tstart=tstart, tend=tend, ndim=0)
+
+    return plottsdata(simname, dts, [tsvars[dirname, varname] for varname in varnames], varlabels, varunits,
+                      plttitle, plttype, scolors, outtype, outfn)